@@ -12,6 +12,14 @@ def create_app(config_name=None):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
 
+    # Fail at startup rather than misallocate payments
+    from .services.allocation_service import validate_waterfall
+    validate_waterfall(app.config['PAYMENT_WATERFALL'])
+
+    # Stream file uploads to disk, hashing as they arrive
+    from .utils.uploads import UploadRequest
+    app.request_class = UploadRequest
+
     # Handle proxy headers from Apache
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 
@@ -22,6 +30,12 @@ def create_app(config_name=None):
     csrf.init_app(app)
     migrate.init_app(app, db)
 
+    # Per-request SQL query stats (development)
+    from .utils.query_stats import init_query_stats
+    from .utils.sql_profiler import init_sql_profiler
+    init_query_stats(app)
+    init_sql_profiler(app)
+
     # Ensure upload directories exist
     os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'documents'), exist_ok=True)
     os.makedirs(os.path.join(app.config['UPLOAD_FOLDER'], 'photos'), exist_ok=True)
@@ -45,12 +59,11 @@ def create_app(config_name=None):
     app.register_blueprint(collections_bp, url_prefix='/collections')
     app.register_blueprint(admin_bp, url_prefix='/admin')
 
-    # User loader for Flask-Login
-    from .models.user import User
-
+    # User loader for Flask-Login: a cached principal, see utils/principal.py
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(user_id)
+        from .utils.principal import load_principal
+        return load_principal(user_id)
 
     # Context processor for templates
     @app.context_processor
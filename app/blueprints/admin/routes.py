@@ -1,6 +1,6 @@
 from datetime import date, timedelta
 from decimal import Decimal
-from flask import render_template, redirect, url_for, flash, request
+from flask import render_template, redirect, url_for, flash, request, abort, Response, send_file, stream_with_context
 from flask_login import login_required, current_user
 from sqlalchemy import func
 from . import admin_bp
@@ -11,12 +11,17 @@ from ...models.loan import Loan, LoanStatus
 from ...models.payment import Payment, PaymentSchedule
 from ...models.audit import AuditLog
 from ...extensions import db
-from ...utils.decorators import admin_required, internal_only
+from ...utils.decorators import admin_required, internal_only, read_only
+from ...utils.db_routing import replica_reads
+from ...utils.principal import invalidate_principal
+from ...services.analytics import analytics_available, cached_portfolio_analytics
+from ...services.exports import EXPORTS, ExportError, get_export, iter_csv, xlsx_available, xlsx_tempfile
 
 
 @admin_bp.route('/')
 @login_required
 @internal_only
+@read_only
 def dashboard():
     """Main dashboard with KPIs."""
     today = date.today()
@@ -110,6 +115,7 @@ def toggle_user_active(id):
         return redirect(url_for('admin.users'))
 
     user.is_active = not user.is_active
+    invalidate_principal(user)
     db.session.commit()
 
     status = 'activated' if user.is_active else 'deactivated'
@@ -135,6 +141,7 @@ def change_user_role(id):
     role = Role.query.get(new_role_id)
     if role:
         user.role_id = role.id
+        invalidate_principal(user)
         db.session.commit()
         flash(f'User role changed to {role.name}.', 'success')
 
@@ -144,6 +151,7 @@ def change_user_role(id):
 @admin_bp.route('/audit-log')
 @login_required
 @admin_required
+@read_only
 def audit_log():
     """View audit logs."""
     page = request.args.get('page', 1, type=int)
@@ -170,6 +178,57 @@ def audit_log():
 @admin_bp.route('/reports')
 @login_required
 @internal_only
+@read_only
 def reports():
     """Reports page."""
-    return render_template('admin/reports.html')
+    analytics = cached_portfolio_analytics() if analytics_available() else None
+    return render_template('admin/reports.html',
+                          exports=EXPORTS,
+                          xlsx_available=xlsx_available(),
+                          analytics=analytics)
+
+
+@admin_bp.route('/exports/<name>')
+@login_required
+@internal_only
+def export(name):
+    """Stream an export as CSV (default) or XLSX with the list page's filters.
+
+    ?columns=a,b selects columns; other query arguments are filters.
+    """
+    if name not in EXPORTS:
+        abort(404)
+    if name == 'audit_logs' and not current_user.is_admin():
+        abort(403)
+
+    fmt = request.args.get('format', 'csv')
+    columns = request.args.get('columns', '').split(',')
+    filters = {k: v for k, v in request.args.items() if k not in ('format', 'columns')}
+    filename = f'{name}_{date.today().isoformat()}'
+
+    try:
+        get_export(name).resolve_columns(columns)
+    except ExportError as e:
+        abort(400, description=str(e))
+
+    if fmt == 'xlsx':
+        if not xlsx_available():
+            abort(400, description='XLSX export is not available')
+        with replica_reads():
+            workbook = xlsx_tempfile(name, columns, filters)
+        return send_file(
+            workbook,
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            as_attachment=True,
+            download_name=f'{filename}.xlsx'
+        )
+
+    def generate():
+        with replica_reads():
+            yield from iter_csv(name, columns, filters)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}.csv'}
+    )
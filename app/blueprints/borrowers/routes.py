@@ -5,7 +5,7 @@ from .forms import BorrowerForm, BorrowerVerificationForm, LinkUserForm
 from ...models.borrower import Borrower, VerificationStatus
 from ...models.user import User
 from ...extensions import db
-from ...utils.decorators import internal_only, role_required
+from ...utils.decorators import internal_only, role_required, read_only
 from ...services.audit_service import log_borrower_action
 from ...services.email import send_registration_invite
 
@@ -13,6 +13,7 @@ from ...services.email import send_registration_invite
 @borrowers_bp.route('/')
 @login_required
 @internal_only
+@read_only
 def index():
     page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', '')
@@ -1,25 +1,37 @@
-from flask import render_template, redirect, url_for, flash, request
+import uuid
+from flask import render_template, redirect, url_for, flash, request, jsonify, abort, current_app
 from flask_login import login_required, current_user
 from . import collateral_bp
 from .forms import PropertyForm, PropertyPhotoForm, PropertyVerificationForm
-from ...models.property import Property, PropertyPhoto
+from ...models.property import Property, PropertyPhoto, PropertyType
 from ...models.borrower import Borrower
 from ...extensions import db
-from ...utils.decorators import internal_only, role_required
-from ...utils.helpers import save_uploaded_file, allowed_document, allowed_image
+from ...utils.decorators import internal_only, role_required, read_only
+from ...utils.downloads import send_upload
+from ...utils.helpers import (
+    save_uploaded_file, allowed_document, allowed_image, GUATEMALA_DEPARTMENTS,
+    PDF_MIME_TYPES, IMAGE_MIME_TYPES
+)
 from ...services.audit_service import log_property_action
+from ...services.loading_profiles import PropertyListProfile, property_ids_with_active_loans
+from ...services.property_map import property_features, parse_bbox, MapQueryError
+from ...services.comparables import estimate_value
+from ...services.file_store import UploadError
+from ...services.photo_pipeline import PHOTO_SIZES, schedule_photo_processing, served_path
+from ...models.loan import LoanStatus
 
 
 @collateral_bp.route('/')
 @login_required
 @internal_only
+@read_only
 def index():
     page = request.args.get('page', 1, type=int)
     verified_filter = request.args.get('verified', '')
     department_filter = request.args.get('department', '')
     search = request.args.get('search', '')
 
-    query = Property.query
+    query = PropertyListProfile.apply(Property.query)
 
     if verified_filter == 'yes':
         query = query.filter_by(verified=True)
@@ -43,14 +55,75 @@ def index():
     properties = query.order_by(Property.created_at.desc()).paginate(
         page=page, per_page=20, error_out=False
     )
+    active_loan_ids = property_ids_with_active_loans([p.id for p in properties.items])
 
     return render_template('collateral/index.html',
                           properties=properties,
+                          active_loan_ids=active_loan_ids,
                           verified_filter=verified_filter,
                           department_filter=department_filter,
                           search=search)
 
 
+@collateral_bp.route('/map')
+@login_required
+@internal_only
+def map_view():
+    return render_template('collateral/map.html',
+                          departments=GUATEMALA_DEPARTMENTS,
+                          LoanStatus=LoanStatus)
+
+
+@collateral_bp.route('/map.geojson')
+@login_required
+@internal_only
+@read_only
+def map_data():
+    """Clustered GeoJSON for ?bbox=min_lon,min_lat,max_lon,max_lat&zoom=N."""
+    try:
+        bbox = parse_bbox(request.args.get('bbox'))
+    except MapQueryError as e:
+        return jsonify({'error': str(e)}), 400
+    zoom = min(max(request.args.get('zoom', 8, type=int), 0), 22)
+
+    return jsonify(property_features(
+        bbox, zoom,
+        loan_status=request.args.get('status') or None,
+        department=request.args.get('department') or None
+    ))
+
+
+@collateral_bp.route('/comparables.json')
+@login_required
+@internal_only
+@read_only
+def comparables():
+    """Comparables estimate for ?property_type=&latitude=&longitude=&market_value=&exclude=."""
+    property_type = request.args.get('property_type')
+    latitude = request.args.get('latitude', type=float)
+    longitude = request.args.get('longitude', type=float)
+    if property_type not in [t.value for t in PropertyType]:
+        return jsonify({'error': 'Unknown property type'}), 400
+    if latitude is None or longitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return jsonify({'error': 'latitude and longitude are required'}), 400
+
+    result = estimate_value(
+        property_type, latitude, longitude,
+        market_value=request.args.get('market_value', type=float),
+        exclude_id=request.args.get('exclude', type=uuid.UUID)
+    )
+    return jsonify({
+        'estimate': float(result['estimate']) if result['estimate'] is not None else None,
+        'deviation': result['deviation'],
+        'flagged': result['flagged'],
+        'comparables': [
+            {'id': str(c['id']), 'appraised_value': float(c['appraised_value']),
+             'distance_km': round(c['distance_km'], 2)}
+            for c in result['comparables']
+        ],
+    })
+
+
 @collateral_bp.route('/new', methods=['GET', 'POST'])
 @login_required
 @role_required('Admin', 'CreditOfficer')
@@ -88,8 +161,13 @@ def create():
 
         # Handle title PDF upload
         if form.title_pdf.data:
-            file_path = save_uploaded_file(form.title_pdf.data, 'documents')
-            property_obj.title_pdf_path = file_path
+            try:
+                property_obj.title_pdf_path = save_uploaded_file(form.title_pdf.data, 'documents',
+                                                                 PDF_MIME_TYPES)
+            except UploadError as e:
+                flash(str(e), 'danger')
+                return render_template('collateral/form.html', form=form, borrower=borrower,
+                                      title='Add Property')
 
         db.session.add(property_obj)
         db.session.commit()
@@ -151,8 +229,14 @@ def edit(id):
             property_obj.set_location(float(form.latitude.data), float(form.longitude.data))
 
         if form.title_pdf.data:
-            file_path = save_uploaded_file(form.title_pdf.data, 'documents')
-            property_obj.title_pdf_path = file_path
+            try:
+                property_obj.title_pdf_path = save_uploaded_file(form.title_pdf.data, 'documents',
+                                                                 PDF_MIME_TYPES)
+            except UploadError as e:
+                db.session.rollback()
+                flash(str(e), 'danger')
+                return render_template('collateral/form.html', form=form, property=property_obj,
+                                      borrower=property_obj.borrower, title='Edit Property')
 
         db.session.commit()
 
@@ -183,6 +267,38 @@ def verify(id):
     return redirect(url_for('collateral.view', id=property_obj.id))
 
 
+@collateral_bp.route('/<uuid:id>/title.pdf')
+@login_required
+@internal_only
+def title_pdf(id):
+    property_obj = Property.query.get_or_404(id)
+    response = send_upload(property_obj.title_pdf_path,
+                           download_name=f'title-{property_obj.registry_number.replace("/", "-")}.pdf')
+    if response is None:
+        abort(404)
+    return response
+
+
+@collateral_bp.route('/photos/<uuid:photo_id>', defaults={'size': 'full'})
+@collateral_bp.route('/photos/<uuid:photo_id>/<size>')
+@login_required
+@internal_only
+def photo(photo_id, size):
+    if size not in PHOTO_SIZES:
+        abort(404)
+    photo_obj = PropertyPhoto.query.get_or_404(photo_id)
+    path = served_path(photo_obj.file_path, size)
+    if path is None:
+        # Not processed yet: never fall back to the original, which still has its EXIF
+        response = current_app.send_static_file('img/photo-pending.svg')
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    response = send_upload(path)
+    if response is None:
+        abort(404)
+    return response
+
+
 @collateral_bp.route('/<uuid:id>/photos', methods=['POST'])
 @login_required
 @role_required('Admin', 'CreditOfficer', 'Legal')
@@ -191,7 +307,11 @@ def add_photo(id):
     form = PropertyPhotoForm()
 
     if form.validate_on_submit():
-        file_path = save_uploaded_file(form.photo.data, 'photos')
+        try:
+            file_path = save_uploaded_file(form.photo.data, 'photos', IMAGE_MIME_TYPES)
+        except UploadError as e:
+            flash(str(e), 'danger')
+            return redirect(url_for('collateral.view', id=property_obj.id))
 
         photo = PropertyPhoto(
             property_id=property_obj.id,
@@ -201,6 +321,7 @@ def add_photo(id):
         )
         db.session.add(photo)
         db.session.commit()
+        schedule_photo_processing(file_path)
 
         flash('Photo uploaded successfully.', 'success')
 
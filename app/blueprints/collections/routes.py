@@ -7,14 +7,16 @@ from .forms import CollectionActionForm, ExtensionForm, LegalEscalationForm
 from ...models.collection import CollectionAction, CollectionStage, ActionType
 from ...models.loan import Loan, LoanStatus
 from ...models.payment import PaymentSchedule
+from ...models.statements import get_loan_or_404
 from ...extensions import db
-from ...utils.decorators import role_required
+from ...utils.decorators import role_required, read_only
 from ...services.audit_service import log_loan_action
 
 
 @collections_bp.route('/')
 @login_required
 @role_required('Admin', 'Collections')
+@read_only
 def index():
     """Collections dashboard showing delinquent loans."""
     today = date.today()
@@ -57,7 +59,7 @@ def index():
 @login_required
 @role_required('Admin', 'Collections')
 def loan_detail(loan_id):
-    loan = Loan.query.get_or_404(loan_id)
+    loan = get_loan_or_404(loan_id)
     actions = loan.collection_actions.order_by(CollectionAction.created_at.desc()).all()
     action_form = CollectionActionForm()
     extension_form = ExtensionForm()
@@ -78,7 +80,7 @@ def loan_detail(loan_id):
 @login_required
 @role_required('Admin', 'Collections')
 def create_action(loan_id):
-    loan = Loan.query.get_or_404(loan_id)
+    loan = get_loan_or_404(loan_id)
     form = CollectionActionForm()
 
     if form.validate_on_submit():
@@ -110,7 +112,7 @@ def create_action(loan_id):
 @login_required
 @role_required('Admin', 'Collections')
 def grant_extension(loan_id):
-    loan = Loan.query.get_or_404(loan_id)
+    loan = get_loan_or_404(loan_id)
     form = ExtensionForm()
 
     if form.validate_on_submit():
@@ -153,7 +155,7 @@ def grant_extension(loan_id):
 @login_required
 @role_required('Admin')
 def escalate_to_legal(loan_id):
-    loan = Loan.query.get_or_404(loan_id)
+    loan = get_loan_or_404(loan_id)
     form = LegalEscalationForm()
 
     if form.validate_on_submit():
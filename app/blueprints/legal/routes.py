@@ -1,35 +1,52 @@
-import os
-from flask import render_template, redirect, url_for, flash, request, send_file, abort
+from flask import render_template, redirect, url_for, flash, request, abort
 from flask_login import login_required, current_user
+from sqlalchemy.exc import IntegrityError
 from . import legal_bp
 from .forms import DocumentUploadForm, DocumentAcceptanceForm
 from ...models.document import Document, ExecutionStatus
 from ...models.loan import Loan
+from ...models.statements import get_loan_or_404
 from ...extensions import db
-from ...utils.decorators import internal_only, role_required
-from ...utils.helpers import save_uploaded_file, get_file_path
+from ...utils.decorators import internal_only, role_required, read_only
+from ...utils.helpers import PDF_MIME_TYPES
+from ...utils.downloads import send_upload
 from ...services.audit_service import log_document_action
+from ...services.file_store import store_upload, UploadError
+from ...services.document_search import apply_search, search_snippets, schedule_indexing
+from ...services.document_versions import add_document, version_history
+from ...services.document_checklist import evaluate_checklists
+from ...services.loading_profiles import DocumentListProfile
 
 
 @legal_bp.route('/')
 @login_required
 @internal_only
+@read_only
 def index():
     page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', '')
+    search = request.args.get('q', '').strip()
 
-    query = Document.query
+    query = DocumentListProfile.apply(Document.query)
 
     if status_filter:
         query = query.filter_by(execution_status=status_filter)
 
-    documents = query.order_by(Document.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False
-    )
+    if search:
+        query = apply_search(query, search)
+    else:
+        query = query.order_by(Document.created_at.desc())
+
+    documents = query.paginate(page=page, per_page=20, error_out=False)
+    snippets = search_snippets([d.id for d in documents.items], search) if search else {}
+    checklists = evaluate_checklists({d.loan_id for d in documents.items})
 
     return render_template('legal/index.html',
                           documents=documents,
-                          status_filter=status_filter)
+                          status_filter=status_filter,
+                          search=search,
+                          snippets=snippets,
+                          checklists=checklists)
 
 
 @legal_bp.route('/upload', methods=['GET', 'POST'])
@@ -39,7 +56,7 @@ def upload():
     doc_type = request.args.get('doc_type')
     loan = None
     if loan_id:
-        loan = Loan.query.get_or_404(loan_id)
+        loan = get_loan_or_404(loan_id)
 
     # Check permissions: internal users or borrower for their own loan
     if current_user.role.name == 'Borrower':
@@ -64,22 +81,35 @@ def upload():
             flash('Loan is required.', 'danger')
             return redirect(url_for('legal.upload'))
 
-        file_path = save_uploaded_file(form.file.data, 'documents')
+        try:
+            stored = store_upload(form.file.data, 'documents', allowed_types=PDF_MIME_TYPES)
+        except UploadError as e:
+            flash(str(e), 'danger')
+            return render_template('legal/upload.html', form=form, loan=loan)
 
         document = Document(
             loan_id=loan_id,
             document_type=form.document_type.data,
             name=form.name.data,
             description=form.description.data,
-            file_path=file_path,
-            file_size=form.file.data.seek(0, 2) or 0,
-            mime_type='application/pdf',
+            file_path=stored.path,
+            file_size=stored.size,
+            mime_type=stored.mime_type,
             execution_status=ExecutionStatus.UPLOADED.value,
             uploaded_by=current_user.id
         )
 
-        db.session.add(document)
-        db.session.commit()
+        try:
+            add_document(document)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash('Another version of this document was uploaded at the same time. '
+                  'Check the loan\'s documents and upload again if needed.', 'warning')
+            if current_user.role.name == 'Borrower':
+                return redirect(url_for('loans.borrower_loan_view', id=loan_id))
+            return redirect(url_for('loans.view', id=loan_id))
+        schedule_indexing(document)
 
         log_document_action(document, 'uploaded')
 
@@ -105,8 +135,10 @@ def view(id):
             abort(403)
 
     acceptance_form = DocumentAcceptanceForm()
+    history = version_history(document.id)
     return render_template('legal/view.html',
                           document=document,
+                          history=history,
                           acceptance_form=acceptance_form)
 
 
@@ -121,13 +153,12 @@ def download(id):
            document.loan.borrower_id != current_user.borrower_profile.id:
             abort(403)
 
-    file_path = get_file_path(document.file_path)
-    if not file_path or not os.path.exists(file_path):
+    response = send_upload(document.file_path, download_name=f'{document.name}.pdf',
+                           as_attachment=True)
+    if response is None:
         flash('File not found.', 'danger')
         return redirect(url_for('legal.view', id=id))
-
-    return send_file(file_path, as_attachment=True,
-                    download_name=f'{document.name}.pdf')
+    return response
 
 
 @legal_bp.route('/<uuid:id>/mark-sent', methods=['POST'])
@@ -6,26 +6,32 @@ from .forms import LoanForm, LoanApprovalForm, LoanActivationForm
 from ...models.loan import Loan, LoanProduct, LoanStatus
 from ...models.borrower import Borrower
 from ...models.property import Property
+from ...models.statements import get_loan_or_404
 from ...extensions import db
-from ...utils.decorators import internal_only, role_required
+from ...utils.decorators import internal_only, role_required, read_only
 from ...utils.helpers import calculate_ltv
 from ...services.loan_service import (
     approve_loan, activate_loan, validate_loan_for_approval,
-    validate_loan_for_activation, LoanValidationError, get_loan_summary
+    validate_loan_for_activation, LoanValidationError
 )
 from ...services.audit_service import log_loan_action
+from ...services.loading_profiles import LoanListProfile, LoanDetailProfile, ActivationQueueProfile
+from ...services.loan_views import LoanDetailView
+from ...services.document_checklist import complete_checklist_loans
 from ...services.email import send_loan_notification
+from ...services.comparables import estimate_for_property
 
 
 @loans_bp.route('/')
 @login_required
 @internal_only
+@read_only
 def index():
     page = request.args.get('page', 1, type=int)
     status_filter = request.args.get('status', '')
     search = request.args.get('search', '')
 
-    query = Loan.query
+    query = LoanListProfile.apply(Loan.query)
 
     if status_filter:
         query = query.filter_by(status=status_filter)
@@ -51,6 +57,22 @@ def index():
                           LoanStatus=LoanStatus)
 
 
+@loans_bp.route('/ready')
+@login_required
+@internal_only
+@read_only
+def ready_to_activate():
+    """Approved loans whose required documents are all executed."""
+    page = request.args.get('page', 1, type=int)
+
+    loans = ActivationQueueProfile.apply(Loan.query).filter(
+        Loan.status == LoanStatus.APPROVED.value,
+        Loan.id.in_(complete_checklist_loans())
+    ).order_by(Loan.approved_at).paginate(page=page, per_page=20, error_out=False)
+
+    return render_template('loans/ready.html', loans=loans)
+
+
 @loans_bp.route('/my-loans')
 @login_required
 def my_loans():
@@ -67,19 +89,22 @@ def my_loans():
 @login_required
 def borrower_loan_view(id):
     """Borrower view of their own loan with documents."""
-    loan = Loan.query.get_or_404(id)
+    loan = LoanDetailProfile.apply(Loan.query).get_or_404(id)
 
     # Verify this is the borrower's loan
     if not current_user.borrower_profile or \
        loan.borrower_id != current_user.borrower_profile.id:
         abort(403)
 
+    detail = LoanDetailView.build(loan)
+
     summary = None
     if loan.status in ['Active', 'Matured', 'Defaulted', 'LegalReady']:
-        summary = get_loan_summary(loan)
+        summary = detail.summary
 
     return render_template('loans/borrower_view.html',
                           loan=loan,
+                          detail=detail,
                           summary=summary)
 
 
@@ -168,7 +193,7 @@ def create():
 @loans_bp.route('/<uuid:id>')
 @login_required
 def view(id):
-    loan = Loan.query.get_or_404(id)
+    loan = LoanDetailProfile.apply(Loan.query).get_or_404(id)
 
     # Borrowers can only view their own loans
     if current_user.role.name == 'Borrower':
@@ -178,19 +203,26 @@ def view(id):
     approval_form = LoanApprovalForm()
     activation_form = LoanActivationForm()
     validation_errors = []
+    valuation = None
+    detail = LoanDetailView.build(loan)
 
     if loan.status == LoanStatus.UNDER_REVIEW.value:
         validation_errors = validate_loan_for_approval(loan)
+        valuation = estimate_for_property(loan.collateral)
     elif loan.status == LoanStatus.APPROVED.value:
-        validation_errors = validate_loan_for_activation(loan)
+        validation_errors = validate_loan_for_activation(
+            loan, documents_complete=detail.documents_complete
+        )
 
-    summary = get_loan_summary(loan)
+    summary = detail.summary
 
     return render_template('loans/view.html',
                           loan=loan,
+                          detail=detail,
                           approval_form=approval_form,
                           activation_form=activation_form,
                           validation_errors=validation_errors,
+                          valuation=valuation,
                           summary=summary,
                           LoanStatus=LoanStatus)
 
@@ -199,7 +231,7 @@ def view(id):
 @login_required
 @role_required('Admin', 'CreditOfficer')
 def submit_for_review(id):
-    loan = Loan.query.get_or_404(id)
+    loan = get_loan_or_404(id)
 
     if loan.status != LoanStatus.DRAFT.value:
         flash('Only draft loans can be submitted for review.', 'danger')
@@ -218,7 +250,7 @@ def submit_for_review(id):
 @login_required
 @role_required('Admin', 'CreditOfficer')
 def approve(id):
-    loan = Loan.query.get_or_404(id)
+    loan = get_loan_or_404(id)
     form = LoanApprovalForm()
 
     if form.validate_on_submit():
@@ -248,7 +280,7 @@ def approve(id):
 @login_required
 @role_required('Admin', 'CreditOfficer')
 def activate(id):
-    loan = Loan.query.get_or_404(id)
+    loan = get_loan_or_404(id)
     form = LoanActivationForm()
 
     if form.validate_on_submit():
@@ -273,7 +305,7 @@ def activate(id):
 @login_required
 @role_required('Admin')
 def close(id):
-    loan = Loan.query.get_or_404(id)
+    loan = get_loan_or_404(id)
 
     if loan.status not in [LoanStatus.MATURED.value, LoanStatus.DEFAULTED.value,
                            LoanStatus.LEGAL_READY.value]:
@@ -1,5 +1,6 @@
 from flask_wtf import FlaskForm
-from wtforms import SelectField, DecimalField, DateField, StringField, TextAreaField, SubmitField
+from flask_wtf.file import FileField, FileAllowed, FileRequired
+from wtforms import BooleanField, SelectField, DecimalField, DateField, StringField, TextAreaField, SubmitField
 from wtforms.validators import DataRequired, Optional, NumberRange
 from ...models.payment import PaymentType
 
@@ -26,3 +27,12 @@ class PaymentForm(FlaskForm):
     reference_number = StringField('Reference Number', validators=[Optional()])
     notes = TextAreaField('Notes', validators=[Optional()])
     submit = SubmitField('Record Payment')
+
+
+class PaymentImportForm(FlaskForm):
+    file = FileField('Bank Statement (CSV)', validators=[
+        FileRequired(),
+        FileAllowed(['csv', 'txt'], 'CSV files only')
+    ])
+    dry_run = BooleanField('Dry run (check matches without recording)')
+    submit = SubmitField('Import Payments')
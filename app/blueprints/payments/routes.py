@@ -1,25 +1,30 @@
+import io
 from datetime import date
-from flask import render_template, redirect, url_for, flash, request
+from flask import render_template, redirect, url_for, flash, request, Response
 from flask_login import login_required, current_user
 from . import payments_bp
-from .forms import PaymentForm
+from .forms import PaymentForm, PaymentImportForm
 from ...models.payment import Payment, PaymentSchedule
 from ...models.loan import Loan, LoanStatus
+from ...models.statements import get_loan_or_404
 from ...extensions import db
-from ...utils.decorators import internal_only, role_required
+from ...utils.decorators import internal_only, role_required, read_only
 from ...services.payment_service import record_payment, get_loan_payment_summary
+from ...services.payment_import import import_payments, PaymentImportError
 from ...services.audit_service import log_payment_action
+from ...services.loading_profiles import PaymentListProfile
 from ...services.email import send_loan_notification
 
 
 @payments_bp.route('/')
 @login_required
 @internal_only
+@read_only
 def index():
     page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
 
-    query = Payment.query
+    query = PaymentListProfile.apply(Payment.query)
 
     if search:
         from ...models.borrower import Borrower
@@ -48,7 +53,7 @@ def record():
     loan_id = request.args.get('loan_id')
     loan = None
     if loan_id:
-        loan = Loan.query.get_or_404(loan_id)
+        loan = get_loan_or_404(loan_id)
         if loan.status not in [LoanStatus.ACTIVE.value, LoanStatus.MATURED.value,
                                LoanStatus.DEFAULTED.value]:
             flash('Cannot record payments for loans not in active status.', 'warning')
@@ -99,11 +104,43 @@ def record():
     return render_template('payments/record.html', form=form, loan=loan)
 
 
+@payments_bp.route('/import', methods=['GET', 'POST'])
+@login_required
+@role_required('Admin', 'Collections')
+def import_statement():
+    form = PaymentImportForm()
+
+    if form.validate_on_submit():
+        stream = io.TextIOWrapper(form.file.data.stream, encoding='utf-8-sig', newline='')
+        results = io.StringIO()
+        try:
+            counts = import_payments(stream, results, recorded_by=current_user.id,
+                                     dry_run=form.dry_run.data)
+        except (PaymentImportError, UnicodeDecodeError) as e:
+            db.session.rollback()
+            flash(f'Import failed: {e}', 'danger')
+            return render_template('payments/import.html', form=form)
+
+        return Response(
+            results.getvalue(),
+            mimetype='text/csv',
+            headers={
+                'Content-Disposition': 'attachment; filename=payment_import_results.csv',
+                'X-Import-Matched': str(counts['matched']),
+                'X-Import-Unmatched': str(counts['unmatched']),
+                'X-Import-Duplicate': str(counts['duplicate']),
+                'X-Import-Invalid': str(counts['invalid']),
+            }
+        )
+
+    return render_template('payments/import.html', form=form)
+
+
 @payments_bp.route('/loan/<uuid:loan_id>')
 @login_required
 @internal_only
 def loan_payments(loan_id):
-    loan = Loan.query.get_or_404(loan_id)
+    loan = get_loan_or_404(loan_id)
     payments = loan.payments.order_by(Payment.payment_date.desc()).all()
     summary = get_loan_payment_summary(loan)
 
@@ -116,6 +153,7 @@ def loan_payments(loan_id):
 @payments_bp.route('/overdue')
 @login_required
 @role_required('Admin', 'Collections')
+@read_only
 def overdue():
     """View overdue payments."""
     today = date.today()
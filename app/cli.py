@@ -8,6 +8,7 @@ from .extensions import db
 from .models.loan import Loan, LoanStatus
 from .models.payment import PaymentSchedule
 from .services.email import send_loan_notification
+from .utils.db_routing import replica_reads
 
 
 @click.command('send-payment-reminders')
@@ -18,13 +19,14 @@ def send_payment_reminders(days_before):
     target_date = date.today() + timedelta(days=days_before)
 
     # Find unpaid payments due on target date
-    upcoming_payments = db.session.query(
-        PaymentSchedule, Loan
-    ).join(Loan).filter(
-        PaymentSchedule.is_paid == False,
-        PaymentSchedule.due_date == target_date,
-        Loan.status == LoanStatus.ACTIVE.value
-    ).all()
+    with replica_reads():
+        upcoming_payments = db.session.query(
+            PaymentSchedule, Loan
+        ).join(Loan).filter(
+            PaymentSchedule.is_paid == False,
+            PaymentSchedule.due_date == target_date,
+            Loan.status == LoanStatus.ACTIVE.value
+        ).all()
 
     sent_count = 0
     error_count = 0
@@ -59,13 +61,14 @@ def send_overdue_notices():
     today = date.today()
 
     # Find overdue payments
-    overdue_payments = db.session.query(
-        PaymentSchedule, Loan
-    ).join(Loan).filter(
-        PaymentSchedule.is_paid == False,
-        PaymentSchedule.due_date < today,
-        Loan.status.in_([LoanStatus.ACTIVE.value, LoanStatus.MATURED.value, LoanStatus.DEFAULTED.value])
-    ).order_by(PaymentSchedule.due_date).all()
+    with replica_reads():
+        overdue_payments = db.session.query(
+            PaymentSchedule, Loan
+        ).join(Loan).filter(
+            PaymentSchedule.is_paid == False,
+            PaymentSchedule.due_date < today,
+            Loan.status.in_([LoanStatus.ACTIVE.value, LoanStatus.MATURED.value, LoanStatus.DEFAULTED.value])
+        ).order_by(PaymentSchedule.due_date).all()
 
     # Group by loan to send one email per loan
     loans_notified = set()
@@ -101,7 +104,439 @@ def send_overdue_notices():
     click.echo(f'\nOverdue notices sent: {sent_count}, errors: {error_count}')
 
 
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans():
+    """EXPLAIN the hot queries and fail if any needs a sequential scan."""
+    from .services.query_plans import get_hot_queries, find_sequential_scans
+
+    queries = get_hot_queries()
+    regressions = find_sequential_scans(queries)
+
+    for name, _ in queries:
+        if name in regressions:
+            click.echo(f'SEQ SCAN  {name}: {", ".join(regressions[name])}', err=True)
+        else:
+            click.echo(f'ok        {name}')
+
+    if regressions:
+        raise click.ClickException(f'{len(regressions)} hot queries regressed to a sequential scan')
+    click.echo(f'\nAll {len(queries)} hot queries use an index.')
+
+
+@click.command('sql-profile-report')
+@click.option('--log', 'log_path', default=None, help='Slow-query log (defaults to SLOW_QUERY_LOG)')
+@click.option('--top', default=10, help='Statements to show per endpoint')
+@with_appcontext
+def sql_profile_report(log_path, top):
+    """Summarize the slow-query log into a per-endpoint top-N report."""
+    from .utils.sql_profiler import read_slow_log, aggregate_slow_log
+
+    log_path = log_path or current_app.config.get('SLOW_QUERY_LOG')
+    if not log_path:
+        raise click.ClickException('No slow-query log configured (set SLOW_QUERY_LOG or pass --log)')
+
+    report = aggregate_slow_log(read_slow_log(log_path), top=top)
+    if not report:
+        click.echo('No slow queries recorded.')
+        return
+
+    for endpoint, total_ms, rows in report:
+        click.echo(f'\n{endpoint}  ({total_ms:,.0f} ms total)')
+        for row in rows:
+            click.echo(f'  {row["count"]:>6}x  total {row["total_ms"]:>10,.1f} ms  '
+                       f'max {row["max_ms"]:>8,.1f} ms  {row["shape"][:120]}')
+            for origin in sorted(row['origins'])[:3]:
+                click.echo(f'           from {origin}')
+
+
+@click.command('benchmark-statements')
+@click.option('--iterations', default=10000, help='Calls per statement')
+@with_appcontext
+def benchmark_statements_command(iterations):
+    """Compare per-call overhead of plain vs cached hot statements."""
+    from .models.statements import benchmark_statements
+
+    click.echo(f'{"statement":<24}{"plain us":>12}{"cached us":>12}{"speedup":>10}')
+    for name, plain_us, cached_us in benchmark_statements(iterations):
+        click.echo(f'{name:<24}{plain_us:>12.1f}{cached_us:>12.1f}{plain_us / cached_us:>9.1f}x')
+
+
+@click.command('rekey-audit-logs')
+@click.option('--batch-size', default=5000, help='Rows re-keyed per transaction')
+@with_appcontext
+def rekey_audit_logs(batch_size):
+    """Replace legacy uuid4 audit log keys with UUIDv7 derived from their timestamp.
+
+    Audit logs are not referenced by foreign keys or URLs, so their keys can be
+    rewritten safely. Payments, schedules, documents and collection actions keep
+    their existing uuid4 keys; only new rows get UUIDv7.
+    """
+    from sqlalchemy import bindparam, func, String
+    from .models.audit import AuditLog
+    from .utils.ids import uuid7, uuid7_from_datetime
+
+    table = AuditLog.__table__
+    rekey = table.update().where(table.c.id == bindparam('old_id')).values(id=bindparam('new_id'))
+    legacy = db.select(AuditLog.id, AuditLog.timestamp).where(
+        func.substr(db.cast(AuditLog.id, String), 15, 1) != '7'
+    ).limit(batch_size)
+
+    total = 0
+    while True:
+        rows = db.session.execute(legacy).all()
+        if not rows:
+            break
+        db.session.connection().execute(rekey, [
+            {'old_id': row.id,
+             'new_id': uuid7_from_datetime(row.timestamp) if row.timestamp else uuid7()}
+            for row in rows
+        ])
+        db.session.commit()
+        total += len(rows)
+        click.echo(f'Re-keyed {total} audit log rows...')
+
+    click.echo(f'\nDone: {total} rows re-keyed. Run REINDEX TABLE audit_logs to compact the indexes.')
+
+
+@click.command('benchmark-uuid-keys')
+@click.option('--rows', default=1000000, help='Rows to insert per key type')
+@click.option('--batch-size', default=10000, help='Rows per INSERT batch')
+@with_appcontext
+def benchmark_uuid_keys(rows, batch_size):
+    """Compare insert throughput and index size of uuid4 vs UUIDv7 keys."""
+    import time
+    import uuid
+    from datetime import datetime
+    from sqlalchemy import text
+    from .utils.ids import uuid7
+
+    if db.engine.dialect.name != 'postgresql':
+        raise click.ClickException('The key benchmark requires PostgreSQL')
+
+    click.echo(f'{"keys":<8}{"rows/s":>12}{"pkey MB":>10}{"table MB":>10}')
+    for label, generate in (('uuid4', uuid.uuid4), ('uuid7', uuid7)):
+        table = f'bench_audit_{label}'
+        with db.engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE IF EXISTS {table}'))
+            conn.execute(text(
+                f'CREATE UNLOGGED TABLE {table} (id uuid PRIMARY KEY, '
+                f'entity_type varchar(50), action varchar(50), timestamp timestamp)'
+            ))
+
+        insert = text(f'INSERT INTO {table} VALUES (:id, :entity_type, :action, :timestamp)')
+        started = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            batch = [
+                {'id': generate(), 'entity_type': 'Payment', 'action': 'recorded',
+                 'timestamp': datetime.utcnow()}
+                for _ in range(min(batch_size, rows - offset))
+            ]
+            with db.engine.begin() as conn:
+                conn.execute(insert, batch)
+        elapsed = time.perf_counter() - started
+
+        with db.engine.begin() as conn:
+            index_bytes = conn.execute(text(f"SELECT pg_relation_size('{table}_pkey')")).scalar()
+            table_bytes = conn.execute(text(f"SELECT pg_relation_size('{table}')")).scalar()
+            conn.execute(text(f'DROP TABLE {table}'))
+
+        click.echo(f'{label:<8}{rows / elapsed:>12,.0f}{index_bytes / 1048576:>10.1f}'
+                   f'{table_bytes / 1048576:>10.1f}')
+
+
+@click.command('import-payments')
+@click.argument('csv_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--recorded-by', required=True, help='Email of the user the payments are recorded by')
+@click.option('--output', default='payment_import_results.csv', help='Per-row result file')
+@click.option('--dry-run', is_flag=True, help='Match rows without recording payments')
+@with_appcontext
+def import_payments_command(csv_file, recorded_by, output, dry_run):
+    """Import payments from a bank-statement CSV."""
+    from .models.user import User
+    from .services.payment_import import import_payments, PaymentImportError
+
+    user = User.query.filter_by(email=recorded_by.lower()).first()
+    if not user:
+        raise click.ClickException(f'No user with email {recorded_by}')
+
+    with open(csv_file, newline='', encoding='utf-8-sig') as stream, \
+            open(output, 'w', newline='', encoding='utf-8') as results:
+        try:
+            counts = import_payments(stream, results, recorded_by=user.id, dry_run=dry_run)
+        except PaymentImportError as e:
+            raise click.ClickException(str(e))
+
+    click.echo(f'Matched: {counts["matched"]}, unmatched: {counts["unmatched"]}, '
+               f'duplicate: {counts["duplicate"]}, invalid: {counts["invalid"]}')
+    if dry_run:
+        click.echo('Dry run: nothing was recorded.')
+    else:
+        click.echo(f'Schedule items paid: {counts["schedule_items_paid"]}, '
+                   f'loans closed: {counts["loans_closed"]}')
+    click.echo(f'Results written to {output}')
+
+
+@click.command('reconcile-payments')
+@click.argument('csv_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--output', default='reconciliation_results.csv', help='Per-row result file')
+@with_appcontext
+def reconcile_payments(csv_file, output):
+    """Reconcile a bank-statement CSV against recorded payments."""
+    import os
+    from .services.payment_import import PaymentImportError
+    from .services.reconciliation import reconcile
+
+    with open(csv_file, newline='', encoding='utf-8-sig') as stream, \
+            open(output, 'w', newline='', encoding='utf-8') as results:
+        try:
+            counts = reconcile(stream, results, source_file=os.path.basename(csv_file))
+        except PaymentImportError as e:
+            raise click.ClickException(str(e))
+
+    click.echo(f'Matched: {counts["matched"]} new, {counts["already_matched"]} from earlier runs')
+    click.echo(f'Missing (deposit without payment): {counts["missing"]}')
+    click.echo(f'Duplicate payments: {counts["duplicate"]}')
+    click.echo(f'Unbanked payments: {counts["unbanked"]}')
+    if counts['invalid']:
+        click.echo(f'Invalid rows skipped: {counts["invalid"]}')
+    click.echo(f'Results written to {output}')
+
+
+@click.command('generate-statements')
+@click.option('--month', default=None, help='Statement month as YYYY-MM (defaults to last month)')
+@click.option('--workers', default=None, type=int, help='Worker processes (defaults to CPU count)')
+@click.option('--partition-size', default=200, help='Borrowers per worker task')
+@click.option('--pdf', is_flag=True, help='Also render PDF (requires weasyprint)')
+@with_appcontext
+def generate_statements_command(month, workers, partition_size, pdf):
+    """Render monthly statements for every borrower with an open loan."""
+    import os
+    from datetime import datetime
+    from dateutil.relativedelta import relativedelta
+    from .services.borrower_statements import generate_statements, pdf_available, statement_folder
+
+    if month:
+        try:
+            period_start = datetime.strptime(month, '%Y-%m').date()
+        except ValueError:
+            raise click.BadParameter('Use YYYY-MM', param_hint='--month')
+    else:
+        period_start = date.today().replace(day=1) - relativedelta(months=1)
+    period_end = period_start + relativedelta(months=1) - timedelta(days=1)
+
+    if pdf and not pdf_available():
+        raise click.ClickException('PDF output requires weasyprint (pip install weasyprint)')
+
+    click.echo(f'Generating statements for {period_start:%Y-%m} into {statement_folder(period_start)}')
+    result = generate_statements(
+        period_start, period_end,
+        config_name=os.getenv('FLASK_ENV', 'development'),
+        workers=workers,
+        partition_size=partition_size,
+        pdf=pdf,
+        progress=lambda done, total: click.echo(f'  {done}/{total} statements')
+    )
+
+    for error in result['errors']:
+        click.echo(f'  Error: {error}')
+    click.echo(f'\nDone: {result["written"]} of {result["borrowers"]} statements in '
+               f'{result["seconds"]:.1f}s ({result["per_second"]:.1f}/s)')
+
+
+@click.command('export')
+@click.argument('name')
+@click.option('--output', required=True, help='Output file (.csv or .xlsx)')
+@click.option('--columns', default='', help='Comma-separated columns (defaults to the standard set)')
+@click.option('--filter', 'filters', multiple=True, help='Filter as key=value, e.g. status=Active')
+@with_appcontext
+def export_command(name, output, columns, filters):
+    """Stream loans, payments, schedules or audit_logs to a CSV or XLSX file."""
+    from .services.exports import EXPORTS, ExportError, write_csv, write_xlsx
+
+    if name not in EXPORTS:
+        raise click.BadParameter(f'Choose from: {", ".join(EXPORTS)}', param_hint='NAME')
+
+    filter_args = {}
+    for item in filters:
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise click.BadParameter(f'Expected key=value, got "{item}"', param_hint='--filter')
+        filter_args[key] = value
+
+    writer = write_xlsx if output.lower().endswith('.xlsx') else write_csv
+    try:
+        with replica_reads():
+            count = writer(name, output, columns.split(','), filter_args)
+    except ExportError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f'Exported {count} rows to {output}')
+
+
+@click.command('snapshot-portfolio')
+@click.option('--table', 'tables', multiple=True, help='Only snapshot these tables')
+@with_appcontext
+def snapshot_portfolio_command(tables):
+    """Append tonight's Parquet snapshots of the portfolio tables."""
+    from .services.snapshots import SNAPSHOT_TABLES, SnapshotError, snapshot_portfolio, snapshot_folder
+
+    unknown = [t for t in tables if t not in SNAPSHOT_TABLES]
+    if unknown:
+        raise click.BadParameter(f'Choose from: {", ".join(SNAPSHOT_TABLES)}', param_hint='--table')
+
+    try:
+        results = snapshot_portfolio(tables or None)
+    except SnapshotError as e:
+        raise click.ClickException(str(e))
+
+    for table_name, partitions in results.items():
+        if not partitions:
+            click.echo(f'{table_name}: up to date')
+        for partition, rows in partitions.items():
+            click.echo(f'{table_name}: {partition.isoformat()} ({rows} rows)')
+    click.echo(f'Snapshots in {snapshot_folder()}')
+
+
+@click.command('portfolio-analytics')
+@click.option('--months', default=24, help='Month-ends to reconstruct')
+@with_appcontext
+def portfolio_analytics_command(months):
+    """Print stage roll rates and timings for the vintage/roll-rate analysis."""
+    from .services.analytics import analytics_available, portfolio_analytics
+
+    if not analytics_available():
+        raise click.ClickException('Analytics require numpy and pandas (pip install numpy pandas)')
+
+    with replica_reads():
+        result = portfolio_analytics(months)
+
+    click.echo(f'{result["loans"]} loans x {len(result["month_ends"])} month-ends: '
+               f'loaded in {result["load_seconds"]:.2f}s, computed in {result["compute_seconds"]:.2f}s\n')
+    click.echo(f'{"from / to":<12}' + ''.join(f'{s:>12}' for s in result['states']))
+    for row in result['roll_rates']:
+        click.echo(f'{row["state"]:<12}' + ''.join(f'{r:>12.1%}' for r in row['rates']))
+
+
+@click.command('gc-uploads')
+@click.option('--dry-run', is_flag=True, help='List unreferenced files without deleting them')
+@click.option('--grace-hours', default=24, help='Keep unreferenced files younger than this')
+@with_appcontext
+def gc_uploads(dry_run, grace_hours):
+    """Delete stored uploads that no document, photo or title refers to."""
+    from .services.file_store import collect_garbage
+
+    removed, freed = collect_garbage(dry_run=dry_run, grace_seconds=grace_hours * 3600)
+    for path in removed:
+        click.echo(f'{"Would remove" if dry_run else "Removed"} {path}')
+    click.echo(f'\n{len(removed)} unreferenced files, {freed / 1024 / 1024:.1f} MB'
+               f'{" (dry run)" if dry_run else " freed"}')
+
+
+@click.command('verify-uploads')
+@click.option('--workers', default=4, help='Files hashed in parallel')
+@with_appcontext
+def verify_uploads(workers):
+    """Re-hash stored uploads and check every referenced file exists."""
+    from .services.file_store import verify_store
+
+    result = verify_store(workers=workers)
+    for path in result['corrupt']:
+        click.echo(f'Corrupt: {path}', err=True)
+    for path in result['missing']:
+        click.echo(f'Missing: {path}', err=True)
+    if result['corrupt'] or result['missing']:
+        raise click.ClickException(f'{len(result["corrupt"])} corrupt and {len(result["missing"])} '
+                                   f'missing of {result["checked"]} stored files')
+    click.echo(f'\nAll {result["checked"]} stored files match their hashes.')
+
+
+@click.command('benchmark-uploads')
+@click.option('--size-mb', default=16, help='Size of the uploaded file')
+@click.option('--runs', default=3, help='Uploads timed per method')
+@with_appcontext
+def benchmark_uploads_command(size_mb, runs):
+    """Compare time and peak memory of spooled vs streaming uploads."""
+    from .services.file_store import benchmark_uploads
+
+    click.echo(f'{"method":<18}{"ms":>10}{"peak MB":>10}')
+    for label, seconds, peak in benchmark_uploads(size_mb, runs):
+        click.echo(f'{label:<18}{seconds * 1000:>10.1f}{peak / 1024 / 1024:>10.1f}')
+
+
+@click.command('process-photos')
+@click.option('--workers', default=None, type=int, help='Worker processes (defaults to CPU count)')
+@click.option('--force', is_flag=True, help='Rewrite renditions that already exist')
+@with_appcontext
+def process_photos_command(workers, force):
+    """Write compressed renditions and thumbnails for existing property photos."""
+    from .services.photo_pipeline import PhotoProcessingError, backfill_photos
+
+    def progress(done, total):
+        if done % 100 == 0 or done == total:
+            click.echo(f'  {done}/{total} photos')
+
+    try:
+        result = backfill_photos(workers=workers, force=force, progress=progress)
+    except PhotoProcessingError as e:
+        raise click.ClickException(str(e))
+
+    for error in result['errors']:
+        click.echo(f'  Error: {error}', err=True)
+    click.echo(f'\nDone: {result["written"]} renditions for {result["photos"]} photos in '
+               f'{result["seconds"]:.1f}s')
+
+
+@click.command('index-documents')
+@click.option('--workers', default=None, type=int, help='Extraction processes (defaults to CPU count)')
+@click.option('--batch-size', default=200, help='Documents extracted and committed per batch')
+@click.option('--reindex', is_flag=True, help='Extract every document again')
+@with_appcontext
+def index_documents_command(workers, batch_size, reindex):
+    """Extract text from document PDFs that aren't indexed yet for full-text search."""
+    from .services.document_search import DocumentSearchError, index_documents
+
+    try:
+        result = index_documents(workers=workers, batch_size=batch_size, reindex=reindex,
+                                 progress=lambda done: click.echo(f'  {done} documents'))
+    except DocumentSearchError as e:
+        raise click.ClickException(str(e))
+
+    for error in result['errors']:
+        click.echo(f'  Error: {error}', err=True)
+    click.echo(f'\nIndexed {result["documents"]} documents ({result["files"]} files) in '
+               f'{result["seconds"]:.1f}s')
+
+
+@click.command('link-document-versions')
+@click.option('--dry-run', is_flag=True, help='Count the documents that would change')
+@with_appcontext
+def link_document_versions(dry_run):
+    """Chain existing contract, title and appraisal uploads into versions per loan."""
+    from .services.document_versions import link_versions
+
+    changed = link_versions(dry_run=dry_run)
+    click.echo(f'{changed} documents {"to relink (dry run)" if dry_run else "relinked"}')
+
+
 def register_cli_commands(app):
     """Register CLI commands with the Flask app."""
     app.cli.add_command(send_payment_reminders)
     app.cli.add_command(send_overdue_notices)
+    app.cli.add_command(check_query_plans)
+    app.cli.add_command(sql_profile_report)
+    app.cli.add_command(benchmark_statements_command)
+    app.cli.add_command(rekey_audit_logs)
+    app.cli.add_command(benchmark_uuid_keys)
+    app.cli.add_command(import_payments_command)
+    app.cli.add_command(reconcile_payments)
+    app.cli.add_command(generate_statements_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(snapshot_portfolio_command)
+    app.cli.add_command(portfolio_analytics_command)
+    app.cli.add_command(gc_uploads)
+    app.cli.add_command(verify_uploads)
+    app.cli.add_command(benchmark_uploads_command)
+    app.cli.add_command(process_photos_command)
+    app.cli.add_command(index_documents_command)
+    app.cli.add_command(link_document_versions)
@@ -9,6 +9,22 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Read replica (optional). Read-only routes and reports use it when set.
+    REPLICA_DATABASE_URL = os.getenv('REPLICA_DATABASE_URL')
+    SQLALCHEMY_BINDS = {'replica': REPLICA_DATABASE_URL} if REPLICA_DATABASE_URL else {}
+    REPLICA_LAG_TOLERANCE = int(os.getenv('REPLICA_LAG_TOLERANCE', 5))  # seconds
+
+    # Per-request query counting (Server-Timing header, N+1 warnings)
+    SQL_QUERY_STATS = False
+    SQL_N_PLUS_ONE_THRESHOLD = 5  # same statement shape this many times per request
+
+    # Slow-query log (JSON lines, rotated). Disabled when SLOW_QUERY_LOG is unset.
+    SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG')  # e.g. /opt/ancla/logs/slow_sql.jsonl
+    SLOW_QUERY_THRESHOLD_MS = int(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+    SQL_PROFILE_SAMPLE_RATE = float(os.getenv('SQL_PROFILE_SAMPLE_RATE', 0.1))  # stack inspection
+    SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+    SLOW_QUERY_LOG_BACKUPS = 5
+
     # Proxy configuration for Apache
     APPLICATION_ROOT = '/ancla'
     PREFERRED_URL_SCHEME = 'https'
@@ -25,28 +41,51 @@ class Config:
     # File uploads
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', '/opt/ancla/uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    # Who sends downloaded files once access is checked: send_file, x-sendfile (Apache)
+    # or x-accel-redirect (nginx)
+    DOWNLOAD_OFFLOAD = os.getenv('DOWNLOAD_OFFLOAD', 'send_file')
+    USE_X_SENDFILE = DOWNLOAD_OFFLOAD == 'x-sendfile'
+    X_ACCEL_PREFIX = os.getenv('X_ACCEL_PREFIX', '/protected-uploads/')
+    FULLTEXT_LANGUAGE = 'spanish'  # text search configuration for document contents
+
+    # Nightly Parquet snapshots for analytics
+    SNAPSHOT_FOLDER = os.getenv('SNAPSHOT_FOLDER', '/opt/ancla/snapshots')
+    ANALYTICS_CACHE_SECONDS = 3600  # vintage / roll-rate tables on the reports page
 
     # Session configuration
     SESSION_COOKIE_SECURE = True  # Always secure (behind HTTPS proxy)
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SAMESITE = 'Lax'
     SESSION_COOKIE_PATH = '/ancla'
+    # Logged-in user, role and permissions cached per worker; role and status changes
+    # reach other workers within this time
+    PRINCIPAL_CACHE_SECONDS = int(os.getenv('PRINCIPAL_CACHE_SECONDS', 60))
 
     # Business rules
     MIN_LOAN_AMOUNT = 10000  # Q10,000
     MAX_LTV = 0.40  # 40%
     DEFAULT_INTEREST_RATE = 0.10  # 10% monthly
     LATE_FEE_RATE = 0.05  # 5% late fee
+    # Order in which a payment covers each schedule item's components
+    PAYMENT_WATERFALL = [c.strip() for c in os.getenv('PAYMENT_WATERFALL', 'LateFee,Interest,Principal')
+                         .split(',') if c.strip()]
     GRACE_PERIOD_DAYS = 5
     DEFAULT_TRIGGER_DAYS = 15
     LEGAL_READY_DAYS = 30
 
+    # Collateral valuation against nearby appraised comparables
+    COMPARABLES_K = 5
+    COMPARABLES_RADIUS_KM = 25
+    COMPARABLES_CACHE_SECONDS = 600  # in-memory KD-tree when PostGIS is unavailable
+    VALUATION_TOLERANCE = 0.25  # flag market values more than 25% off the estimate
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
     SESSION_COOKIE_SECURE = False  # Allow non-HTTPS in development
     SERVER_NAME = None  # Don't enforce server name in dev
     PREFERRED_URL_SCHEME = 'http'
+    SQL_QUERY_STATS = True
 
 
 class ProductionConfig(Config):
@@ -3,9 +3,10 @@ from .audit import AuditLog
 from .borrower import Borrower, VerificationStatus, RiskTier
 from .property import Property, PropertyType
 from .loan import Loan, LoanProduct, LoanStatus
-from .document import Document, DocumentType, ExecutionStatus
-from .payment import Payment, PaymentSchedule, PaymentType
+from .document import Document, DocumentType, ExecutionStatus, DocumentText
+from .payment import Payment, PaymentSchedule, PaymentType, PaymentAllocation, AllocationComponent
 from .collection import CollectionAction, CollectionStage, ActionType
+from .reconciliation import BankTransaction, ReconciliationStatus
 
 __all__ = [
     'User', 'Role', 'RoleName',
@@ -13,7 +14,8 @@ __all__ = [
     'Borrower', 'VerificationStatus', 'RiskTier',
     'Property', 'PropertyType',
     'Loan', 'LoanProduct', 'LoanStatus',
-    'Document', 'DocumentType', 'ExecutionStatus',
-    'Payment', 'PaymentSchedule', 'PaymentType',
-    'CollectionAction', 'CollectionStage', 'ActionType'
+    'Document', 'DocumentType', 'ExecutionStatus', 'DocumentText',
+    'Payment', 'PaymentSchedule', 'PaymentType', 'PaymentAllocation', 'AllocationComponent',
+    'CollectionAction', 'CollectionStage', 'ActionType',
+    'BankTransaction', 'ReconciliationStatus'
 ]
@@ -1,13 +1,13 @@
-import uuid
 from datetime import datetime
 from sqlalchemy.dialects.postgresql import UUID, JSON
 from ..extensions import db
+from ..utils.ids import uuid7
 
 
 class AuditLog(db.Model):
     __tablename__ = 'audit_logs'
 
-    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     entity_type = db.Column(db.String(50), nullable=False, index=True)
     entity_id = db.Column(UUID(as_uuid=True), nullable=False, index=True)
     action = db.Column(db.String(50), nullable=False)
@@ -20,6 +20,11 @@ class RiskTier(str, Enum):
 
 class Borrower(db.Model):
     __tablename__ = 'borrowers'
+    __table_args__ = (
+        db.Index('ix_borrowers_active_created', 'created_at',
+                 postgresql_where=db.text('is_deleted = false'),
+                 sqlite_where=db.text('is_deleted = 0')),
+    )
 
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = db.Column(UUID(as_uuid=True), db.ForeignKey('users.id'), unique=True, nullable=True)
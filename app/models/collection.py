@@ -1,8 +1,8 @@
-import uuid
 from enum import Enum
 from datetime import datetime
 from sqlalchemy.dialects.postgresql import UUID
 from ..extensions import db
+from ..utils.ids import uuid7
 
 
 class CollectionStage(str, Enum):
@@ -27,8 +27,11 @@ class ActionType(str, Enum):
 
 class CollectionAction(db.Model):
     __tablename__ = 'collection_actions'
+    __table_args__ = (
+        db.Index('ix_collection_actions_loan_created', 'loan_id', 'created_at'),
+    )
 
-    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     loan_id = db.Column(UUID(as_uuid=True), db.ForeignKey('loans.id'), nullable=False)
 
     stage = db.Column(db.String(20), nullable=False)
@@ -1,8 +1,8 @@
-import uuid
 from enum import Enum
 from datetime import datetime
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 from ..extensions import db
+from ..utils.ids import uuid7
 
 
 class DocumentType(str, Enum):
@@ -25,10 +25,36 @@ class ExecutionStatus(str, Enum):
     REJECTED = 'Rejected'
 
 
+# Documents that must be executed before a loan can be activated
+REQUIRED_DOCUMENTS = [
+    (DocumentType.MUTUO_MERCANTIL.value, 'Mutuo Mercantil', 'Loan agreement contract'),
+    (DocumentType.PAGARE.value, 'Pagaré', 'Promissory note'),
+    (DocumentType.PROMESA_COMPRAVENTA.value, 'Promesa de Compraventa', 'Property sale promise agreement'),
+]
+
+# Types a loan has one of: a new upload becomes the next version of the current one.
+# Annexes, DPI copies etc. may be several per loan, so each upload starts its own chain.
+SINGLE_VERSION_TYPES = tuple(doc_type for doc_type, _, _ in REQUIRED_DOCUMENTS) + (
+    DocumentType.PROPERTY_TITLE.value,
+    DocumentType.APPRAISAL.value,
+)
+_SINGLE_VERSION_SQL = ', '.join(f"'{doc_type}'" for doc_type in SINGLE_VERSION_TYPES)
+
+
 class Document(db.Model):
     __tablename__ = 'documents'
-
-    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    __table_args__ = (
+        db.Index('ix_documents_loan_type', 'loan_id', 'document_type'),
+        db.Index('ix_documents_created_at', 'created_at'),
+        db.Index('ix_documents_status_created', 'execution_status', 'created_at'),
+        db.Index('ix_documents_parent_id', 'parent_id'),
+        # At most one current version per loan and type; also serves checklist lookups
+        db.Index('ux_documents_current', 'loan_id', 'document_type', unique=True,
+                 postgresql_where=db.text(f'is_current AND document_type IN ({_SINGLE_VERSION_SQL})'),
+                 sqlite_where=db.text(f'is_current = 1 AND document_type IN ({_SINGLE_VERSION_SQL})')),
+    )
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     loan_id = db.Column(UUID(as_uuid=True), db.ForeignKey('loans.id'), nullable=False)
 
     document_type = db.Column(db.String(30), nullable=False)
@@ -43,6 +69,7 @@ class Document(db.Model):
     # Versioning
     version = db.Column(db.Integer, default=1)
     parent_id = db.Column(UUID(as_uuid=True), db.ForeignKey('documents.id'), nullable=True)
+    is_current = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
 
     # Status
     execution_status = db.Column(db.String(20), default=ExecutionStatus.PENDING.value)
@@ -75,6 +102,7 @@ class Document(db.Model):
         self.accepted_user_agent = user_agent
 
     def create_new_version(self, file_path, uploaded_by):
+        self.is_current = False
         new_doc = Document(
             loan_id=self.loan_id,
             document_type=self.document_type,
@@ -83,6 +111,7 @@ class Document(db.Model):
             file_path=file_path,
             version=self.version + 1,
             parent_id=self.id,
+            is_current=True,
             uploaded_by=uploaded_by
         )
         return new_doc
@@ -98,3 +127,30 @@ class Document(db.Model):
             DocumentType.PAGARE.value,
             DocumentType.PROMESA_COMPRAVENTA.value
         ]
+
+
+class DocumentText(db.Model):
+    """Text extracted from a document's PDF, for full-text search.
+
+    search_vector is filled with to_tsvector() on PostgreSQL; on SQLite the
+    text is indexed in the document_text_fts FTS5 table instead (see
+    services/document_search.py).
+    """
+    __tablename__ = 'document_texts'
+    __table_args__ = (
+        db.Index('ix_document_texts_search', 'search_vector', postgresql_using='gin'),
+    )
+
+    document_id = db.Column(UUID(as_uuid=True), db.ForeignKey('documents.id', ondelete='CASCADE'),
+                            primary_key=True)
+    content = db.Column(db.Text, nullable=False, default='')
+    search_vector = db.Column(TSVECTOR().with_variant(db.Text(), 'sqlite'))
+    pages = db.Column(db.Integer)
+    error = db.Column(db.String(500))
+    extracted_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    document = db.relationship('Document', backref=db.backref('text', uselist=False,
+                                                              cascade='all, delete-orphan'))
+
+    def __repr__(self):
+        return f'<DocumentText for Document {self.document_id}>'
@@ -92,6 +92,12 @@ class LoanProduct(db.Model):
 
 class Loan(db.Model):
     __tablename__ = 'loans'
+    __table_args__ = (
+        db.Index('ix_loans_borrower_created', 'borrower_id', 'created_at'),
+        db.Index('ix_loans_property_status', 'property_id', 'status'),
+        db.Index('ix_loans_created_at', 'created_at'),
+        db.Index('ix_loans_status_created', 'status', 'created_at'),
+    )
 
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     loan_number = db.Column(db.String(20), unique=True, nullable=False)
@@ -178,77 +184,41 @@ class Loan(db.Model):
 
     @property
     def outstanding_principal(self):
-        from .payment import Payment, PaymentType
-        paid = db.session.query(
-            db.func.coalesce(db.func.sum(Payment.amount), 0)
-        ).filter(
-            Payment.loan_id == self.id,
-            Payment.payment_type == PaymentType.PRINCIPAL.value
+        from .payment import PaymentType
+        from .statements import payment_total
+        paid = db.session.execute(
+            payment_total(self.id, PaymentType.PRINCIPAL.value)
         ).scalar()
         return self.loan_amount - paid
 
     @property
     def outstanding_interest(self):
-        from .payment import Payment, PaymentType
-        total_interest_due = sum(s.interest_due for s in self.schedule if s.due_date <= date.today())
-        paid = db.session.query(
-            db.func.coalesce(db.func.sum(Payment.amount), 0)
-        ).filter(
-            Payment.loan_id == self.id,
-            Payment.payment_type == PaymentType.INTEREST.value
+        from .payment import PaymentType
+        from .statements import payment_total, interest_due_to_date
+        total_interest_due = db.session.execute(
+            interest_due_to_date(self.id, date.today())
+        ).scalar()
+        paid = db.session.execute(
+            payment_total(self.id, PaymentType.INTEREST.value)
         ).scalar()
         return total_interest_due - paid
 
     @property
     def days_past_due(self):
-        unpaid_schedule = self.schedule.filter_by(is_paid=False).first()
+        from .statements import next_unpaid_schedule
+        unpaid_schedule = db.session.execute(next_unpaid_schedule(self.id)).scalar()
         if unpaid_schedule and unpaid_schedule.due_date < date.today():
             return (date.today() - unpaid_schedule.due_date).days
         return 0
 
     def all_documents_complete(self):
-        from .document import DocumentType, ExecutionStatus
-        required_docs = [
-            DocumentType.MUTUO_MERCANTIL.value,
-            DocumentType.PAGARE.value,
-            DocumentType.PROMESA_COMPRAVENTA.value
-        ]
-        for doc_type in required_docs:
-            doc = self.documents.filter_by(document_type=doc_type).first()
-            if not doc or doc.execution_status != ExecutionStatus.EXECUTED.value:
-                return False
-        return True
+        from ..services.document_checklist import evaluate_checklist
+        return evaluate_checklist(self.id).is_complete
 
     def get_document_checklist(self):
         """Return checklist of required documents with their status."""
-        from .document import DocumentType, ExecutionStatus
-
-        required_docs = [
-            (DocumentType.MUTUO_MERCANTIL.value, 'Mutuo Mercantil', 'Loan agreement contract'),
-            (DocumentType.PAGARE.value, 'Pagaré', 'Promissory note'),
-            (DocumentType.PROMESA_COMPRAVENTA.value, 'Promesa de Compraventa', 'Property sale promise agreement'),
-        ]
-
-        checklist = []
-        for doc_type, display_name, description in required_docs:
-            doc = self.documents.filter_by(document_type=doc_type).first()
-            if doc:
-                status = doc.execution_status
-                is_complete = (status == ExecutionStatus.EXECUTED.value)
-            else:
-                status = 'Not Uploaded'
-                is_complete = False
-
-            checklist.append({
-                'type': doc_type,
-                'name': display_name,
-                'description': description,
-                'status': status,
-                'is_complete': is_complete,
-                'document': doc
-            })
-
-        return checklist
+        from ..services.document_checklist import evaluate_checklist
+        return evaluate_checklist(self.id).items
 
     def calculate_maturity_date(self, start_date=None):
         if start_date is None:
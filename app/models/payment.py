@@ -1,8 +1,8 @@
-import uuid
 from enum import Enum
 from datetime import datetime, date
 from sqlalchemy.dialects.postgresql import UUID
 from ..extensions import db
+from ..utils.ids import uuid7
 
 
 class PaymentType(str, Enum):
@@ -12,10 +12,25 @@ class PaymentType(str, Enum):
     OTHER = 'Other'
 
 
+class AllocationComponent(str, Enum):
+    LATE_FEE = 'LateFee'
+    INTEREST = 'Interest'
+    PRINCIPAL = 'Principal'
+
+
 class PaymentSchedule(db.Model):
     __tablename__ = 'payment_schedule'
-
-    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    __table_args__ = (
+        db.Index('ix_payment_schedule_loan_number', 'loan_id', 'payment_number'),
+        db.Index('ix_payment_schedule_unpaid_loan_due', 'loan_id', 'due_date',
+                 postgresql_where=db.text('is_paid = false'),
+                 sqlite_where=db.text('is_paid = 0')),
+        db.Index('ix_payment_schedule_unpaid_due', 'due_date',
+                 postgresql_where=db.text('is_paid = false'),
+                 sqlite_where=db.text('is_paid = 0')),
+    )
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     loan_id = db.Column(UUID(as_uuid=True), db.ForeignKey('loans.id'), nullable=False)
 
     payment_number = db.Column(db.Integer, nullable=False)
@@ -33,6 +48,7 @@ class PaymentSchedule(db.Model):
     # Relationships
     loan = db.relationship('Loan', back_populates='schedule')
     payments = db.relationship('Payment', back_populates='schedule_item', lazy='dynamic')
+    allocations = db.relationship('PaymentAllocation', back_populates='schedule_item', lazy='dynamic')
 
     def __repr__(self):
         return f'<PaymentSchedule #{self.payment_number} for Loan {self.loan_id}>'
@@ -63,8 +79,14 @@ class PaymentSchedule(db.Model):
 
 class Payment(db.Model):
     __tablename__ = 'payments'
-
-    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    __table_args__ = (
+        db.Index('ix_payments_loan_type', 'loan_id', 'payment_type'),
+        db.Index('ix_payments_loan_date', 'loan_id', 'payment_date'),
+        db.Index('ix_payments_type_date', 'payment_type', 'payment_date'),
+        db.Index('ix_payments_payment_date', 'payment_date'),
+    )
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     loan_id = db.Column(UUID(as_uuid=True), db.ForeignKey('loans.id'), nullable=False)
     schedule_id = db.Column(UUID(as_uuid=True), db.ForeignKey('payment_schedule.id'), nullable=True)
 
@@ -84,6 +106,34 @@ class Payment(db.Model):
     loan = db.relationship('Loan', back_populates='payments')
     schedule_item = db.relationship('PaymentSchedule', back_populates='payments')
     recorder = db.relationship('User')
+    allocations = db.relationship('PaymentAllocation', back_populates='payment', lazy='dynamic')
 
     def __repr__(self):
         return f'<Payment {self.amount} for Loan {self.loan_id}>'
+
+
+class PaymentAllocation(db.Model):
+    """Portion of a payment applied to one component of one schedule item."""
+    __tablename__ = 'payment_allocations'
+    __table_args__ = (
+        db.Index('ix_payment_allocations_schedule_component', 'schedule_id', 'component'),
+        db.Index('ix_payment_allocations_payment', 'payment_id'),
+        db.Index('ix_payment_allocations_loan', 'loan_id'),
+    )
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    payment_id = db.Column(UUID(as_uuid=True), db.ForeignKey('payments.id'), nullable=False)
+    schedule_id = db.Column(UUID(as_uuid=True), db.ForeignKey('payment_schedule.id'), nullable=False)
+    loan_id = db.Column(UUID(as_uuid=True), db.ForeignKey('loans.id'), nullable=False)
+
+    component = db.Column(db.String(20), nullable=False)
+    amount = db.Column(db.Numeric(14, 2), nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Relationships
+    payment = db.relationship('Payment', back_populates='allocations')
+    schedule_item = db.relationship('PaymentSchedule', back_populates='allocations')
+
+    def __repr__(self):
+        return f'<PaymentAllocation {self.component} {self.amount} to {self.schedule_id}>'
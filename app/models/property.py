@@ -15,6 +15,11 @@ class PropertyType(str, Enum):
 
 class Property(db.Model):
     __tablename__ = 'properties'
+    __table_args__ = (
+        db.Index('ix_properties_borrower_id', 'borrower_id'),
+        db.Index('ix_properties_created_at', 'created_at'),
+        db.Index('ix_properties_location', 'location', postgresql_using='gist'),
+    )
 
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     borrower_id = db.Column(UUID(as_uuid=True), db.ForeignKey('borrowers.id'), nullable=False)
@@ -31,7 +36,7 @@ class Property(db.Model):
     department = db.Column(db.String(50), nullable=False)
     municipality = db.Column(db.String(100), nullable=False)
     address = db.Column(db.Text)
-    location = db.Column(Geography(geometry_type='POINT', srid=4326))
+    location = db.Column(Geography(geometry_type='POINT', srid=4326, spatial_index=False))  # GIST index in __table_args__
 
     # Valuation
     market_value = db.Column(db.Numeric(14, 2), nullable=False)
@@ -95,6 +100,9 @@ class Property(db.Model):
 
 class PropertyPhoto(db.Model):
     __tablename__ = 'property_photos'
+    __table_args__ = (
+        db.Index('ix_property_photos_property_id', 'property_id'),
+    )
 
     id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     property_id = db.Column(UUID(as_uuid=True), db.ForeignKey('properties.id'), nullable=False)
@@ -0,0 +1,42 @@
+from enum import Enum
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import UUID
+from ..extensions import db
+from ..utils.ids import uuid7
+
+
+class ReconciliationStatus(str, Enum):
+    MATCHED = 'Matched'
+    MISSING = 'Missing'  # Deposit with no recorded payment
+
+
+class BankTransaction(db.Model):
+    """A bank deposit seen by reconciliation, with its match result.
+
+    Rows are keyed by fingerprint so re-running over an overlapping export
+    updates existing rows instead of adding new ones.
+    """
+    __tablename__ = 'bank_transactions'
+    __table_args__ = (
+        db.Index('ix_bank_transactions_status_date', 'status', 'transaction_date'),
+    )
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
+    fingerprint = db.Column(db.String(64), unique=True, nullable=False)
+
+    transaction_date = db.Column(db.Date, nullable=False, index=True)
+    amount = db.Column(db.Numeric(14, 2), nullable=False)
+    reference = db.Column(db.String(200))
+
+    status = db.Column(db.String(20), nullable=False)
+    payment_id = db.Column(UUID(as_uuid=True), db.ForeignKey('payments.id'), unique=True, nullable=True)
+    match_method = db.Column(db.String(20))  # exact, reference, amount_date
+
+    source_file = db.Column(db.String(255))
+    first_seen_at = db.Column(db.DateTime, default=datetime.utcnow)
+    reconciled_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    payment = db.relationship('Payment')
+
+    def __repr__(self):
+        return f'<BankTransaction {self.transaction_date} {self.amount} {self.status}>'
@@ -96,6 +96,8 @@ class User(UserMixin, db.Model):
     role_id = db.Column(db.Integer, db.ForeignKey('roles.id'), nullable=False)
 
     is_active = db.Column(db.Boolean, default=True)
+    # Bumped when role or status changes, so cached principals are reloaded
+    auth_version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     is_verified = db.Column(db.Boolean, default=False)
     verification_token = db.Column(db.String(200))
     token_expires = db.Column(db.DateTime)
@@ -0,0 +1,224 @@
+"""Payment allocation waterfall.
+
+A payment is spread over a loan's unpaid schedule items, oldest first, and
+within each item over its components in the PAYMENT_WATERFALL order
+(late fee, interest, principal by default). Every portion is recorded as a
+PaymentAllocation, so partial payments carry over to the next payment.
+
+The waterfall itself works on schedules preloaded into memory; the loaders
+below fetch them for one loan or for a batch of loans in a fixed number of
+queries.
+"""
+from decimal import Decimal
+from flask import current_app
+from ..models.payment import PaymentSchedule, PaymentAllocation, PaymentType, AllocationComponent
+from ..extensions import db
+
+BULK_BATCH_SIZE = 1000
+
+DEFAULT_WATERFALL = [
+    AllocationComponent.LATE_FEE.value,
+    AllocationComponent.INTEREST.value,
+    AllocationComponent.PRINCIPAL.value
+]
+
+# Components each payment type may be applied to. Interest payments never
+# reduce principal, which Loan.outstanding_principal tracks from Principal payments.
+PAYMENT_TYPE_COMPONENTS = {
+    PaymentType.INTEREST.value: {AllocationComponent.LATE_FEE.value, AllocationComponent.INTEREST.value},
+    PaymentType.LATE_FEE.value: {AllocationComponent.LATE_FEE.value},
+    PaymentType.PRINCIPAL.value: {AllocationComponent.PRINCIPAL.value},
+}
+
+
+class ScheduleItemState:
+    """In-memory balance of one unpaid schedule item."""
+
+    def __init__(self, schedule_id, loan_id, due_date, late_fee, interest_due, principal_due,
+                 allocated=None):
+        allocated = allocated or {}
+        self.schedule_id = schedule_id
+        self.loan_id = loan_id
+        self.due_date = due_date
+        self.owed = {}
+        for component, due in ((AllocationComponent.LATE_FEE.value, late_fee),
+                               (AllocationComponent.INTEREST.value, interest_due),
+                               (AllocationComponent.PRINCIPAL.value, principal_due)):
+            self.owed[component] = max(Decimal(due or 0) - allocated.get(component, Decimal('0')),
+                                       Decimal('0'))
+        self.paid_date = None
+
+    @property
+    def is_paid(self):
+        return all(amount == 0 for amount in self.owed.values())
+
+
+def validate_waterfall(waterfall):
+    """Raise ValueError unless waterfall lists every component exactly once.
+
+    A misspelled or missing component would otherwise be skipped by
+    allocate() and leave payments silently unallocated.
+    """
+    components = {c.value for c in AllocationComponent}
+    unknown = [c for c in waterfall if c not in components]
+    missing = sorted(components - set(waterfall))
+    repeated = sorted({c for c in waterfall if waterfall.count(c) > 1})
+    if unknown or missing or repeated:
+        problems = [f'{label}: {", ".join(values)}' for label, values in
+                    (('unknown', unknown), ('missing', missing), ('repeated', repeated)) if values]
+        raise ValueError(f'PAYMENT_WATERFALL must list {", ".join(DEFAULT_WATERFALL)} once each, '
+                         f'in any order ({"; ".join(problems)})')
+    return waterfall
+
+
+def get_waterfall():
+    return validate_waterfall(current_app.config.get('PAYMENT_WATERFALL') or DEFAULT_WATERFALL)
+
+
+def allocate(payment_id, payment_type, amount, payment_date, items, waterfall=None):
+    """Apply one payment to preloaded schedule items.
+
+    Items are updated in place (owed balances and paid_date). Returns a list
+    of allocation dicts and the unallocated remainder.
+    """
+    waterfall = waterfall or get_waterfall()
+    eligible = PAYMENT_TYPE_COMPONENTS.get(payment_type, set())
+    components = [c for c in waterfall if c in eligible]
+    remaining = Decimal(str(amount))
+    allocations = []
+
+    for item in items:
+        if remaining <= 0:
+            break
+        if item.is_paid:
+            continue
+        for component in components:
+            portion = min(remaining, item.owed[component])
+            if portion <= 0:
+                continue
+            item.owed[component] -= portion
+            remaining -= portion
+            allocations.append({
+                'payment_id': payment_id,
+                'schedule_id': item.schedule_id,
+                'loan_id': item.loan_id,
+                'component': component,
+                'amount': portion,
+            })
+            if remaining <= 0:
+                break
+        if item.is_paid and item.paid_date is None:
+            item.paid_date = payment_date
+
+    return allocations, remaining
+
+
+def _allocated_totals(schedule_ids):
+    """{schedule_id: {component: amount}} already allocated to the given items."""
+    totals = {}
+    if not schedule_ids:
+        return totals
+    rows = db.session.execute(
+        db.select(PaymentAllocation.schedule_id, PaymentAllocation.component,
+                  db.func.sum(PaymentAllocation.amount).label('amount'))
+        .where(PaymentAllocation.schedule_id.in_(schedule_ids))
+        .group_by(PaymentAllocation.schedule_id, PaymentAllocation.component)
+    )
+    for row in rows:
+        totals.setdefault(row.schedule_id, {})[row.component] = Decimal(row.amount)
+    return totals
+
+
+def _item_states(schedule_rows):
+    totals = _allocated_totals([row.id for row in schedule_rows])
+    return [
+        ScheduleItemState(row.id, row.loan_id, row.due_date, row.late_fee,
+                          row.interest_due, row.principal_due, totals.get(row.id))
+        for row in schedule_rows
+    ]
+
+
+def load_unpaid_schedules(loan_ids):
+    """{loan_id: [ScheduleItemState]} for the unpaid items of many loans.
+
+    Two queries per batch of BULK_BATCH_SIZE loans.
+    """
+    loan_ids = list(loan_ids)
+    schedules = {loan_id: [] for loan_id in loan_ids}
+    for start in range(0, len(loan_ids), BULK_BATCH_SIZE):
+        rows = db.session.execute(
+            db.select(PaymentSchedule.id, PaymentSchedule.loan_id, PaymentSchedule.due_date,
+                      PaymentSchedule.late_fee, PaymentSchedule.interest_due,
+                      PaymentSchedule.principal_due)
+            .where(PaymentSchedule.loan_id.in_(loan_ids[start:start + BULK_BATCH_SIZE]),
+                   PaymentSchedule.is_paid == False)
+            .order_by(PaymentSchedule.loan_id, PaymentSchedule.due_date)
+        ).all()
+        for item in _item_states(rows):
+            schedules[item.loan_id].append(item)
+    return schedules
+
+
+def allocate_payment(payment, schedule=None):
+    """Allocate a single pending Payment (not yet flushed) to its loan's schedule.
+
+    `schedule` is the loan's unpaid PaymentSchedule objects in due order; it
+    is loaded if not given. Paid items are marked through the ORM and the
+    allocations are added to the session.
+    """
+    if schedule is None:
+        schedule = PaymentSchedule.query.filter_by(
+            loan_id=payment.loan_id, is_paid=False
+        ).order_by(PaymentSchedule.due_date).all()
+
+    items = _item_states(schedule)
+    allocations, remaining = allocate(payment.id, payment.payment_type, payment.amount,
+                                      payment.payment_date, items)
+
+    for item, schedule_item in zip(items, schedule):
+        if item.paid_date is not None:
+            schedule_item.mark_paid(item.paid_date)
+
+    for allocation in allocations:
+        del allocation['payment_id']
+        db.session.add(PaymentAllocation(payment=payment, **allocation))
+    if allocations:
+        payment.schedule_id = allocations[0]['schedule_id']
+    return remaining
+
+
+def allocate_payments(payments):
+    """Allocate a batch of already-inserted payments across many loans in one pass.
+
+    `payments` are dicts with id, loan_id, payment_type, amount and
+    payment_date. Schedules are preloaded for all loans at once, payments are
+    applied per loan in date order, and allocations and paid items are written
+    with one bulk INSERT and one bulk UPDATE. Returns (allocation_count,
+    items_paid).
+    """
+    by_loan = {}
+    for payment in payments:
+        if payment['payment_type'] in PAYMENT_TYPE_COMPONENTS:
+            by_loan.setdefault(payment['loan_id'], []).append(payment)
+
+    waterfall = get_waterfall()
+    schedules = load_unpaid_schedules(by_loan)
+    allocations = []
+    paid_updates = []
+    for loan_id, loan_payments in by_loan.items():
+        items = schedules[loan_id]
+        for payment in sorted(loan_payments, key=lambda p: p['payment_date']):
+            payment_allocations, _ = allocate(payment['id'], payment['payment_type'],
+                                              payment['amount'], payment['payment_date'],
+                                              items, waterfall)
+            allocations.extend(payment_allocations)
+        paid_updates.extend(
+            {'id': item.schedule_id, 'is_paid': True, 'paid_date': item.paid_date}
+            for item in items if item.paid_date is not None
+        )
+
+    if allocations:
+        db.session.execute(db.insert(PaymentAllocation), allocations)
+    if paid_updates:
+        db.session.execute(db.update(PaymentSchedule), paid_updates)
+    return len(allocations), len(paid_updates)
@@ -0,0 +1,237 @@
+"""Vintage curves and collection-stage roll rates.
+
+Month-end delinquency is reconstructed for every loan from payment_schedule
+(due_date, paid_date) as NumPy arrays: one vectorized pass per month-end,
+never a Python loop per loan. A loan's state at a month-end is its
+CollectionStage by days past due (as CollectionAction.determine_stage), or
+Closed once every installment is paid.
+
+Requires numpy and pandas (optional dependencies).
+"""
+import time
+from datetime import date
+from flask import current_app
+from ..models.collection import CollectionStage
+from ..models.loan import Loan
+from ..models.payment import Payment, PaymentSchedule
+from ..extensions import db
+
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:  # Analytics are optional
+    np = pd = None
+
+STATE_LABELS = [
+    CollectionStage.CURRENT.value,
+    CollectionStage.GRACE.value,
+    CollectionStage.REMINDER.value,
+    CollectionStage.DELINQUENT.value,
+    CollectionStage.LEGAL_READY.value,
+    'Closed',
+]
+DELINQUENT = STATE_LABELS.index(CollectionStage.DELINQUENT.value)
+CLOSED = STATE_LABELS.index('Closed')
+NOT_ON_BOOK = -1
+
+# Days-past-due upper bounds of Current, Grace (from config), Reminder, Delinquent
+REMINDER_MAX_DAYS = 15
+DELINQUENT_MAX_DAYS = 30
+
+_cache = {}
+
+
+def analytics_available():
+    return np is not None
+
+
+def month_ends(months, as_of):
+    """The last `months` completed month-ends before `as_of`, oldest first."""
+    last = np.datetime64(as_of, 'M') - 1
+    starts = np.arange(last - months + 1, last + 1)
+    return (starts + 1).astype('datetime64[D]') - 1
+
+
+def _dates(values):
+    return np.array(values, dtype='datetime64[D]')
+
+
+def load_portfolio():
+    """Disbursed loans, their schedules and payments as arrays."""
+    loans = db.session.execute(
+        db.select(Loan.id, Loan.disbursement_date, Loan.loan_amount)
+        .where(Loan.disbursement_date.isnot(None))
+    ).all()
+    loan_index = pd.Index([row.id for row in loans])
+
+    schedule = db.session.execute(
+        db.select(PaymentSchedule.loan_id, PaymentSchedule.due_date, PaymentSchedule.paid_date)
+        .join(Loan, PaymentSchedule.loan_id == Loan.id)
+        .where(Loan.disbursement_date.isnot(None))
+    ).all()
+    payments = db.session.execute(
+        db.select(Payment.loan_id, Payment.payment_date, Payment.amount)
+        .join(Loan, Payment.loan_id == Loan.id)
+        .where(Loan.disbursement_date.isnot(None))
+    ).all()
+
+    sched_loan = loan_index.get_indexer([row.loan_id for row in schedule])
+    due = _dates([row.due_date for row in schedule])
+    paid = _dates([row.paid_date for row in schedule])
+    paid = np.where(np.isnat(paid), np.datetime64('9999-12-31'), paid)
+    order = np.lexsort((due, sched_loan))
+
+    return {
+        'disbursed': _dates([row.disbursement_date for row in loans]),
+        'amount': np.array([float(row.loan_amount) for row in loans]),
+        'sched_loan': sched_loan[order],
+        'due': due[order],
+        'paid': paid[order],
+        'pay_loan': loan_index.get_indexer([row.loan_id for row in payments]),
+        'pay_date': _dates([row.payment_date for row in payments]),
+        'pay_amount': np.array([float(row.amount) for row in payments]),
+    }
+
+
+def month_end_states(portfolio, ends, grace_period):
+    """(loans x months) int8 array of state codes; NOT_ON_BOOK before disbursement."""
+    disbursed = portfolio['disbursed']
+    sched_loan, due, paid = portfolio['sched_loan'], portfolio['due'], portfolio['paid']
+    n_loans = len(disbursed)
+    bounds = np.array([0, grace_period, REMINDER_MAX_DAYS, DELINQUENT_MAX_DAYS])
+    has_schedule = np.zeros(n_loans, dtype=bool)
+    has_schedule[sched_loan] = True
+
+    states = np.full((n_loans, len(ends)), NOT_ON_BOOK, dtype=np.int8)
+    for j, month_end in enumerate(ends):
+        open_rows = paid > month_end
+        is_open = np.zeros(n_loans, dtype=bool)
+        is_open[sched_loan[open_rows]] = True
+
+        # Rows are sorted by loan then due date, so the first overdue row per loan is the oldest
+        overdue = open_rows & (due < month_end)
+        oldest_due = np.full(n_loans, month_end, dtype='datetime64[D]')
+        loans_overdue, first = np.unique(sched_loan[overdue], return_index=True)
+        oldest_due[loans_overdue] = due[overdue][first]
+        days_past_due = (month_end - oldest_due).astype(np.int64)
+
+        stage = np.searchsorted(bounds, days_past_due, side='left')
+        state = np.where(is_open, stage, CLOSED)
+        on_book = has_schedule & (disbursed <= month_end)
+        states[:, j] = np.where(on_book, state, NOT_ON_BOOK)
+    return states
+
+
+def _curve_rows(table, counts):
+    rows = []
+    for cohort, values in table.iterrows():
+        rows.append({
+            'cohort': str(cohort),
+            'loans': int(counts.get(cohort, 0)),
+            'values': [None if pd.isna(v) else float(v) for v in values],
+        })
+    return rows
+
+
+def vintage_curves(portfolio, states, ends):
+    """Share of each disbursement-month cohort in Delinquent or worse, and cumulative
+    collections over disbursed amount, by months on book."""
+    cohort = portfolio['disbursed'].astype('datetime64[M]')
+    months = ends.astype('datetime64[M]')
+    in_window = cohort >= months[0]
+    mob = (months[None, :] - cohort[:, None]).astype(np.int64)
+    on_book = (states != NOT_ON_BOOK) & in_window[:, None]
+
+    n_months = len(ends)
+    cells = pd.DataFrame({
+        'cohort': np.repeat(cohort, n_months)[on_book.ravel()].astype(str),
+        'mob': mob.ravel()[on_book.ravel()],
+        'bad': ((states >= DELINQUENT) & (states != CLOSED)).ravel()[on_book.ravel()],
+    })
+    if cells.empty:
+        return {'months_on_book': [], 'delinquency': [], 'collections': []}
+    delinquency = cells.groupby(['cohort', 'mob'])['bad'].mean().unstack('mob').sort_index()
+    counts = pd.Series(cohort[in_window].astype(str)).value_counts()
+
+    pay_loan = portfolio['pay_loan']
+    keep = (pay_loan >= 0) & in_window[np.maximum(pay_loan, 0)]
+    pay_cohort = cohort[pay_loan[keep]]
+    pay_mob = (portfolio['pay_date'][keep].astype('datetime64[M]') - pay_cohort).astype(np.int64)
+    collected = pd.DataFrame({
+        'cohort': pay_cohort.astype(str),
+        'mob': pay_mob,
+        'amount': portfolio['pay_amount'][keep],
+    })
+    collected = collected[(collected['mob'] >= 0) & (collected['mob'] < n_months)]
+    disbursed = pd.Series(portfolio['amount'][in_window]).groupby(cohort[in_window].astype(str)).sum()
+    if collected.empty:
+        cumulative = pd.DataFrame(0.0, index=delinquency.index, columns=delinquency.columns)
+    else:
+        cumulative = (collected.groupby(['cohort', 'mob'])['amount'].sum().unstack('mob')
+                      .reindex(index=delinquency.index, columns=delinquency.columns)
+                      .fillna(0).cumsum(axis=1))
+    cumulative = cumulative.div(disbursed.reindex(cumulative.index), axis=0).where(delinquency.notna())
+
+    return {
+        'months_on_book': [int(m) for m in delinquency.columns],
+        'delinquency': _curve_rows(delinquency, counts),
+        'collections': _curve_rows(cumulative, counts),
+    }
+
+
+def roll_rates(states):
+    """Month-to-month transition matrices between states.
+
+    Returns (average over the window, latest month) as lists of row dicts
+    with counts and row-normalized rates.
+    """
+    n = len(STATE_LABELS)
+
+    def matrix(before, after):
+        valid = (before != NOT_ON_BOOK) & (after != NOT_ON_BOOK) & (before != CLOSED)
+        counts = np.bincount(before[valid].astype(np.int64) * n + after[valid],
+                             minlength=n * n).reshape(n, n)
+        totals = counts.sum(axis=1, keepdims=True)
+        rates = np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+        return [
+            {'state': STATE_LABELS[i], 'total': int(totals[i, 0]),
+             'rates': [float(r) for r in rates[i]]}
+            for i in range(n) if i != CLOSED
+        ]
+
+    if states.shape[1] < 2:
+        return [], []
+    return (matrix(states[:, :-1].ravel(), states[:, 1:].ravel()),
+            matrix(states[:, -2], states[:, -1]))
+
+
+def portfolio_analytics(months=24, as_of=None):
+    """Vintage curves and roll rates for the last `months` month-ends."""
+    started = time.perf_counter()
+    as_of = as_of or date.today()
+    ends = month_ends(months, as_of)
+    portfolio = load_portfolio()
+    loaded = time.perf_counter()
+    states = month_end_states(portfolio, ends, current_app.config.get('GRACE_PERIOD_DAYS', 5))
+    average, latest = roll_rates(states)
+    return {
+        'month_ends': [str(d) for d in ends],
+        'loans': len(portfolio['disbursed']),
+        'vintages': vintage_curves(portfolio, states, ends),
+        'roll_rates': average,
+        'latest_roll_rates': latest,
+        'states': STATE_LABELS,
+        'load_seconds': loaded - started,
+        'compute_seconds': time.perf_counter() - loaded,
+    }
+
+
+def cached_portfolio_analytics(months=24):
+    """portfolio_analytics(), recomputed at most every ANALYTICS_CACHE_SECONDS."""
+    ttl = current_app.config.get('ANALYTICS_CACHE_SECONDS', 3600)
+    cached = _cache.get(months)
+    if cached and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+    result = portfolio_analytics(months)
+    _cache[months] = (time.monotonic(), result)
+    return result
@@ -0,0 +1,149 @@
+"""Periodic borrower statements, rendered in bulk on a process pool.
+
+The parent process only lists the borrowers to include and splits them into
+partitions. Each worker process builds its own app, loads borrowers, loans,
+schedules and payments for a whole partition in four queries, and renders
+one statement per borrower into the upload folder.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from flask import current_app, render_template
+from ..models.borrower import Borrower
+from ..models.loan import Loan, LoanStatus
+from ..models.payment import Payment, PaymentSchedule
+from ..extensions import db
+from .loan_service import summarize_loan
+
+STATEMENT_STATUSES = [
+    LoanStatus.ACTIVE.value,
+    LoanStatus.MATURED.value,
+    LoanStatus.DEFAULTED.value,
+    LoanStatus.LEGAL_READY.value
+]
+
+try:
+    from weasyprint import HTML
+except ImportError:  # PDF output is optional
+    HTML = None
+
+
+def pdf_available():
+    return HTML is not None
+
+
+def statement_borrower_ids():
+    rows = db.session.execute(
+        db.select(Loan.borrower_id).where(Loan.status.in_(STATEMENT_STATUSES)).distinct()
+    )
+    return [row.borrower_id for row in rows]
+
+
+def statement_folder(period_start):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'statements',
+                        period_start.strftime('%Y-%m'))
+
+
+def _group_by_loan(rows):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.loan_id, []).append(row)
+    return grouped
+
+
+def render_partition(borrower_ids, period_start, period_end, pdf=False):
+    """Render statements for one partition of borrowers. Returns (written, errors)."""
+    borrowers = Borrower.query.filter(Borrower.id.in_(borrower_ids)).all()
+    loans = Loan.query.filter(
+        Loan.borrower_id.in_(borrower_ids),
+        Loan.status.in_(STATEMENT_STATUSES)
+    ).order_by(Loan.created_at).all()
+    loan_ids = [loan.id for loan in loans]
+    schedules = _group_by_loan(PaymentSchedule.query.filter(
+        PaymentSchedule.loan_id.in_(loan_ids)
+    ).order_by(PaymentSchedule.payment_number))
+    payments = _group_by_loan(Payment.query.filter(
+        Payment.loan_id.in_(loan_ids),
+        Payment.payment_date <= period_end
+    ).order_by(Payment.payment_date))
+
+    loans_by_borrower = {}
+    for loan in loans:
+        schedule = schedules.get(loan.id, [])
+        loan_payments = payments.get(loan.id, [])
+        loans_by_borrower.setdefault(loan.borrower_id, []).append({
+            'loan': loan,
+            'summary': summarize_loan(loan, schedule, loan_payments, today=period_end),
+            'period_payments': [p for p in loan_payments if p.payment_date >= period_start],
+            'next_due': next((s for s in schedule if not s.is_paid), None),
+        })
+
+    folder = statement_folder(period_start)
+    os.makedirs(folder, exist_ok=True)
+    written, errors = 0, []
+    for borrower in borrowers:
+        try:
+            html = render_template('statements/borrower_statement.html',
+                                   borrower=borrower,
+                                   loans=loans_by_borrower.get(borrower.id, []),
+                                   period_start=period_start,
+                                   period_end=period_end)
+            path = os.path.join(folder, f'{borrower.id}.html')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(html)
+            if pdf and HTML is not None:
+                HTML(string=html).write_pdf(os.path.join(folder, f'{borrower.id}.pdf'))
+            written += 1
+        except Exception as e:
+            errors.append(f'{borrower.id}: {e}')
+
+    db.session.remove()
+    return written, errors
+
+
+_worker_app = None
+
+
+def _init_worker(config_name):
+    """Give each worker process its own app, context and connection pool."""
+    global _worker_app
+    from .. import create_app
+    _worker_app = create_app(config_name)
+    _worker_app.app_context().push()
+
+
+def generate_statements(period_start, period_end, config_name, workers=None,
+                        partition_size=200, pdf=False, progress=None):
+    """Render statements for every borrower with an open loan.
+
+    Returns a dict with borrowers, written, errors, seconds and per_second.
+    """
+    borrower_ids = statement_borrower_ids()
+    partitions = [borrower_ids[i:i + partition_size]
+                  for i in range(0, len(borrower_ids), partition_size)]
+
+    # Don't hand inherited connections to forked workers
+    db.session.remove()
+    db.engine.dispose()
+
+    started = time.perf_counter()
+    written, errors = 0, []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(config_name,)) as executor:
+        futures = [executor.submit(render_partition, ids, period_start, period_end, pdf)
+                   for ids in partitions]
+        for future in as_completed(futures):
+            count, partition_errors = future.result()
+            written += count
+            errors.extend(partition_errors)
+            if progress:
+                progress(written, len(borrower_ids))
+    seconds = time.perf_counter() - started
+
+    return {
+        'borrowers': len(borrower_ids),
+        'written': written,
+        'errors': errors,
+        'seconds': seconds,
+        'per_second': written / seconds if seconds else 0,
+    }
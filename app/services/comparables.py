@@ -0,0 +1,203 @@
+"""Comparable-sales valuation for collateral.
+
+Finds the k nearest appraised properties of the same PropertyType and
+weights their appraised values by inverse distance. On PostgreSQL the
+search runs in SQL: ST_DWithin narrows to the radius and the ``<->``
+operator orders by distance, both served by the GIST index on location.
+Without PostGIS (e.g. tests on SQLite) a KD-tree over the cached
+coordinates of each property type answers the same query in memory.
+
+    estimate = estimate_value('House', 14.6349, -90.5069, market_value=850000)
+    estimate['estimate'], estimate['deviation'], estimate['comparables']
+"""
+import heapq
+import math
+import time
+from decimal import Decimal
+from flask import current_app
+from geoalchemy2 import Geography
+from ..models.property import Property
+from ..extensions import db
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_K = 5
+DEFAULT_RADIUS_KM = 25
+# Comparables closer than this count as this close, so one next door doesn't take all the weight
+MIN_DISTANCE_KM = 0.1
+
+_trees = {}
+
+
+def _unit_vector(latitude, longitude):
+    lat, lon = math.radians(latitude), math.radians(longitude)
+    return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(chord / 2, 1.0))
+
+
+def _km_to_chord(km):
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+class KDTree:
+    """3-d tree over points on the unit sphere.
+
+    Straight-line (chord) distance between unit vectors orders points the
+    same way as great-circle distance, so plain Euclidean splits work
+    across the antimeridian and near the poles.
+    """
+
+    def __init__(self, items):
+        """items: [(latitude, longitude, payload)]."""
+        points = [(_unit_vector(lat, lon), payload) for lat, lon, payload in items]
+        self.size = len(points)
+        self.root = self._build(points, 0)
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda p: p[0][axis])
+        middle = len(points) // 2
+        return (points[middle], axis,
+                self._build(points[:middle], depth + 1),
+                self._build(points[middle + 1:], depth + 1))
+
+    def nearest(self, latitude, longitude, k, radius_km=None, exclude=None):
+        """[(distance_km, payload)] of the k nearest points, closest first.
+
+        Points whose payload[0] equals `exclude` are skipped.
+        """
+        target = _unit_vector(latitude, longitude)
+        limit = _km_to_chord(radius_km) if radius_km is not None else float('inf')
+        heap = []  # max-heap of (-distance, counter, payload)
+        stack = [self.root]
+        counter = 0
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            (point, payload), axis, left, right = node
+            distance = math.dist(point, target)
+            if distance <= limit and (exclude is None or payload[0] != exclude):
+                counter += 1
+                if len(heap) < k:
+                    heapq.heappush(heap, (-distance, counter, payload))
+                elif distance < -heap[0][0]:
+                    heapq.heapreplace(heap, (-distance, counter, payload))
+
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            bound = min(limit, -heap[0][0]) if len(heap) == k else limit
+            if abs(diff) <= bound:
+                stack.append(far)
+            stack.append(near)  # popped first
+        return [(_chord_to_km(-d), payload) for d, _, payload in sorted(heap, reverse=True)]
+
+
+def _uses_postgis():
+    return db.session.get_bind().dialect.name == 'postgresql'
+
+
+def _appraised_coordinates(property_type):
+    """[(latitude, longitude, (id, appraised_value))] of appraised properties of a type."""
+    rows = db.session.execute(
+        db.select(Property.id, Property.location, Property.appraised_value)
+        .where(Property.property_type == property_type,
+               Property.appraised_value.isnot(None),
+               Property.location.isnot(None))
+    )
+    from geoalchemy2.shape import to_shape
+    items = []
+    for row in rows:
+        point = to_shape(row.location)
+        items.append((point.y, point.x, (row.id, row.appraised_value)))
+    return items
+
+
+def _tree(property_type):
+    """Cached KD-tree for a property type, rebuilt every COMPARABLES_CACHE_SECONDS."""
+    ttl = current_app.config.get('COMPARABLES_CACHE_SECONDS', 600)
+    cached = _trees.get(property_type)
+    if cached and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+    tree = KDTree(_appraised_coordinates(property_type))
+    _trees[property_type] = (time.monotonic(), tree)
+    return tree
+
+
+def _nearest_postgis(property_type, latitude, longitude, k, radius_km, exclude_id):
+    point = db.cast(db.func.ST_SetSRID(db.func.ST_MakePoint(longitude, latitude), 4326), Geography)
+    stmt = (
+        db.select(Property.id, Property.appraised_value,
+                  (db.func.ST_Distance(Property.location, point) / 1000).label('distance_km'))
+        .where(Property.property_type == property_type,
+               Property.appraised_value.isnot(None),
+               db.func.ST_DWithin(Property.location, point, radius_km * 1000))
+        .order_by(Property.location.op('<->')(point))
+        .limit(k)
+    )
+    if exclude_id is not None:
+        stmt = stmt.where(Property.id != exclude_id)
+    return [(float(row.distance_km), (row.id, row.appraised_value))
+            for row in db.session.execute(stmt)]
+
+
+def find_comparables(property_type, latitude, longitude, k=DEFAULT_K,
+                     radius_km=DEFAULT_RADIUS_KM, exclude_id=None):
+    """The k nearest appraised properties of the same type within radius_km.
+
+    Returns [{'id', 'appraised_value', 'distance_km'}], closest first.
+    """
+    if _uses_postgis():
+        nearest = _nearest_postgis(property_type, latitude, longitude, k, radius_km, exclude_id)
+    else:
+        nearest = _tree(property_type).nearest(latitude, longitude, k, radius_km, exclude_id)
+    return [{'id': property_id, 'appraised_value': value, 'distance_km': distance}
+            for distance, (property_id, value) in nearest]
+
+
+def weighted_estimate(comparables):
+    """Inverse-distance weighted mean of appraised values, or None without comparables."""
+    if not comparables:
+        return None
+    weights = [1 / max(c['distance_km'], MIN_DISTANCE_KM) for c in comparables]
+    total = sum(w * float(c['appraised_value']) for w, c in zip(weights, comparables))
+    return Decimal(str(round(total / sum(weights), 2)))
+
+
+def estimate_value(property_type, latitude, longitude, market_value=None, exclude_id=None,
+                   k=None, radius_km=None):
+    """Comparables, their weighted estimate and how far market_value is from it.
+
+    deviation is (market_value - estimate) / estimate; flagged is set when it
+    exceeds VALUATION_TOLERANCE in either direction.
+    """
+    config = current_app.config
+    comparables = find_comparables(
+        property_type, latitude, longitude,
+        k=k or config.get('COMPARABLES_K', DEFAULT_K),
+        radius_km=radius_km or config.get('COMPARABLES_RADIUS_KM', DEFAULT_RADIUS_KM),
+        exclude_id=exclude_id
+    )
+    estimate = weighted_estimate(comparables)
+    deviation = None
+    if estimate and market_value is not None:
+        deviation = float((Decimal(str(market_value)) - estimate) / estimate)
+    return {
+        'estimate': estimate,
+        'comparables': comparables,
+        'deviation': deviation,
+        'flagged': deviation is not None and abs(deviation) > config.get('VALUATION_TOLERANCE', 0.25),
+    }
+
+
+def estimate_for_property(property_obj):
+    """estimate_value() for a saved property, leaving the property itself out."""
+    coords = property_obj.get_coordinates()
+    if coords is None:
+        return None
+    return estimate_value(property_obj.property_type, coords['latitude'], coords['longitude'],
+                          market_value=property_obj.market_value, exclude_id=property_obj.id)
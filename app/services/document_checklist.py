@@ -0,0 +1,84 @@
+"""Required-document checklists for one loan or a page of loans.
+
+A checklist is decided by the current version of each required document
+(Document.is_current, see document_versions.py). evaluate_checklists()
+reads those rows for any number of loans in one query served by
+ux_documents_current, and complete_checklist_loans() finds the loans whose
+required documents are all executed with one grouped query, so the
+activation queue filters and paginates in SQL.
+"""
+from ..models.document import Document, ExecutionStatus, REQUIRED_DOCUMENTS
+from ..extensions import db
+
+REQUIRED_TYPES = [doc_type for doc_type, _, _ in REQUIRED_DOCUMENTS]
+
+
+class DocumentChecklist:
+    """Status of each required document, from the loan's current documents.
+
+    current maps document type to a row dict with at least id and
+    execution_status.
+    """
+
+    def __init__(self, current):
+        self.items = []
+        for doc_type, display_name, description in REQUIRED_DOCUMENTS:
+            doc = current.get(doc_type)
+            if doc:
+                status = doc['execution_status']
+                is_complete = status == ExecutionStatus.EXECUTED.value
+            else:
+                status = 'Not Uploaded'
+                is_complete = False
+
+            self.items.append({
+                'type': doc_type,
+                'name': display_name,
+                'description': description,
+                'status': status,
+                'is_complete': is_complete,
+                'document': doc
+            })
+        self.complete_count = sum(1 for item in self.items if item['is_complete'])
+        self.is_complete = self.complete_count == len(self.items)
+
+    @classmethod
+    def from_documents(cls, documents):
+        """Checklist from a loan's already loaded document rows, without a query."""
+        return cls({doc['document_type']: doc for doc in documents
+                    if doc['is_current'] and doc['document_type'] in REQUIRED_TYPES})
+
+
+def evaluate_checklists(loan_ids):
+    """{loan id: DocumentChecklist} for every loan in loan_ids, in one query."""
+    current = {loan_id: {} for loan_id in loan_ids}
+    if not current:
+        return {}
+    rows = db.session.execute(
+        db.select(Document.loan_id, Document.document_type, Document.id, Document.execution_status)
+        .where(Document.loan_id.in_(list(current)),
+               Document.document_type.in_(REQUIRED_TYPES),
+               Document.is_current == True)
+    )
+    for row in rows:
+        current[row.loan_id][row.document_type] = {
+            'id': row.id,
+            'execution_status': row.execution_status,
+        }
+    return {loan_id: DocumentChecklist(docs) for loan_id, docs in current.items()}
+
+
+def evaluate_checklist(loan_id):
+    return evaluate_checklists([loan_id])[loan_id]
+
+
+def complete_checklist_loans():
+    """Select of loan ids whose required documents are all executed."""
+    return (
+        db.select(Document.loan_id)
+        .where(Document.document_type.in_(REQUIRED_TYPES),
+               Document.is_current == True,
+               Document.execution_status == ExecutionStatus.EXECUTED.value)
+        .group_by(Document.loan_id)
+        .having(db.func.count() == len(REQUIRED_TYPES))
+    )
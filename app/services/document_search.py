@@ -0,0 +1,241 @@
+"""Full-text search over the contents of uploaded legal documents.
+
+Text is pulled from each Document's PDF with pypdf (pure Python) into
+document_texts. On PostgreSQL it is indexed as a tsvector with a GIN index
+and queried with websearch_to_tsquery, so a search for a finca number,
+notary or clause touches only the matching rows. On SQLite the same text
+goes into an FTS5 table.
+
+New uploads are indexed in the background right after they are saved;
+``flask index-documents`` picks up anything missed and backfills existing
+documents on a process pool. Documents sharing a stored file (the store is
+content-addressed) are extracted once.
+
+Requires pypdf (optional dependency).
+"""
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from markupsafe import Markup, escape
+from ..models.document import Document, DocumentText
+from ..extensions import db
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # Document search is optional
+    PdfReader = None
+
+BATCH_SIZE = 200
+FTS_TABLE = 'document_text_fts'
+# ts_headline / snippet markers, replaced by <mark> after escaping the text
+MARK_START, MARK_END = '⟦', '⟧'
+SNIPPET_OPTIONS = f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=30, MinWords=12, MaxFragments=2'
+
+_executor = None
+
+
+class DocumentSearchError(Exception):
+    pass
+
+
+def search_available():
+    return PdfReader is not None
+
+
+def _language():
+    return current_app.config.get('FULLTEXT_LANGUAGE', 'spanish')
+
+
+def _uses_postgres():
+    return db.session.get_bind().dialect.name == 'postgresql'
+
+
+def extract_text(path):
+    """(text, pages) of a PDF. Needs no app context, so it can run in a pool worker."""
+    reader = PdfReader(path)
+    texts = [page.extract_text() or '' for page in reader.pages]
+    # PostgreSQL text can't hold NUL characters
+    return '\n'.join(texts).replace('\x00', ''), len(reader.pages)
+
+
+def _extract_safely(path):
+    try:
+        text, pages = extract_text(path)
+        return text, pages, None
+    except Exception as e:
+        return '', None, str(e)[:500]
+
+
+def _ensure_fts_table():
+    db.session.execute(db.text(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(content, document_id UNINDEXED, '
+        f"tokenize='unicode61 remove_diacritics 2')"
+    ))
+
+
+def save_texts(results):
+    """Store extracted text. results: [(document_ids, text, pages, error)]."""
+    postgres = _uses_postgres()
+    if not postgres:
+        _ensure_fts_table()
+    now = datetime.utcnow()
+    for document_ids, text, pages, error in results:
+        for document_id in document_ids:
+            row = db.session.get(DocumentText, document_id) or DocumentText(document_id=document_id)
+            row.content = text
+            row.pages = pages
+            row.error = error
+            row.extracted_at = now
+            if postgres:
+                row.search_vector = db.func.to_tsvector(_language(), text)
+            db.session.add(row)
+            if not postgres:
+                # Keyed like the documents.id column stores UUIDs on SQLite (32 hex digits)
+                db.session.execute(db.text(f'DELETE FROM {FTS_TABLE} WHERE document_id = :id'),
+                                   {'id': document_id.hex})
+                db.session.execute(
+                    db.text(f'INSERT INTO {FTS_TABLE} (content, document_id) VALUES (:content, :id)'),
+                    {'content': text, 'id': document_id.hex}
+                )
+
+
+def _pending_batch(batch_size, reindex_before=None):
+    """{file_path: [document ids]} for up to batch_size documents without text."""
+    stmt = (
+        db.select(Document.id, Document.file_path)
+        .outerjoin(DocumentText, DocumentText.document_id == Document.id)
+        .where(db.or_(Document.mime_type == 'application/pdf', Document.mime_type.is_(None)))
+        .order_by(Document.created_at)
+        .limit(batch_size)
+    )
+    if reindex_before is not None:
+        stmt = stmt.where(db.or_(DocumentText.document_id.is_(None),
+                                 DocumentText.extracted_at < reindex_before))
+    else:
+        stmt = stmt.where(DocumentText.document_id.is_(None))
+    grouped = {}
+    for row in db.session.execute(stmt):
+        grouped.setdefault(row.file_path, []).append(row.id)
+    return grouped
+
+
+def index_documents(workers=None, batch_size=BATCH_SIZE, reindex=False, progress=None):
+    """Extract and index every document that has no text yet.
+
+    Extraction runs on a process pool (pypdf is CPU-bound pure Python);
+    each batch is saved and committed by this process. With reindex, all
+    documents are extracted again. Returns a dict with documents, files,
+    errors and seconds.
+    """
+    if PdfReader is None:
+        raise DocumentSearchError('Document search requires pypdf (pip install pypdf)')
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    reindex_before = datetime.utcnow() if reindex else None
+    started = time.perf_counter()
+    documents, files, errors = 0, 0, []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = _pending_batch(batch_size, reindex_before)
+            if not batch:
+                break
+            paths = list(batch)
+            extracted = executor.map(_extract_safely, [os.path.join(upload_folder, p) for p in paths])
+            results = []
+            for path, (text, pages, error) in zip(paths, extracted):
+                results.append((batch[path], text, pages, error))
+                if error:
+                    errors.append(f'{path}: {error}')
+            save_texts(results)
+            db.session.commit()
+            files += len(paths)
+            documents += sum(len(ids) for ids in batch.values())
+            if progress:
+                progress(documents)
+
+    return {
+        'documents': documents,
+        'files': files,
+        'errors': errors,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def _index_in_background(app, document_id):
+    with app.app_context():
+        try:
+            document = db.session.get(Document, document_id)
+            if document is None:
+                return
+            text, pages, error = _extract_safely(
+                os.path.join(app.config['UPLOAD_FOLDER'], document.file_path)
+            )
+            save_texts([([document_id], text, pages, error)])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            # index-documents picks the document up on its next run
+            app.logger.error(f'Indexing document {document_id} failed: {str(e)}')
+        finally:
+            db.session.remove()
+
+
+def schedule_indexing(document):
+    """Index a newly uploaded document on a background thread. No-op without pypdf."""
+    global _executor
+    if PdfReader is None:
+        return None
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='document-index')
+    return _executor.submit(_index_in_background, current_app._get_current_object(), document.id)
+
+
+def _fts_query(query):
+    """FTS5 query matching every word of the input, without FTS5 operators."""
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def apply_search(query, text):
+    """Filter and rank a Document query by full-text match on `text`."""
+    if _uses_postgres():
+        tsquery = db.func.websearch_to_tsquery(_language(), text)
+        return (query.join(DocumentText, DocumentText.document_id == Document.id)
+                .filter(DocumentText.search_vector.op('@@')(tsquery))
+                .order_by(db.func.ts_rank(DocumentText.search_vector, tsquery).desc()))
+
+    _ensure_fts_table()
+    fts = db.table(FTS_TABLE, db.column('document_id'))
+    matches = db.select(fts.c.document_id).where(
+        db.literal_column(FTS_TABLE).op('MATCH')(_fts_query(text) or '""')
+    )
+    return query.filter(db.cast(Document.id, db.String).in_(matches)).order_by(Document.created_at.desc())
+
+
+def _highlight(snippet):
+    return Markup(str(escape(snippet)).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def search_snippets(document_ids, text):
+    """{document id: highlighted excerpt} for a page of search results."""
+    if not document_ids:
+        return {}
+    if _uses_postgres():
+        tsquery = db.func.websearch_to_tsquery(_language(), text)
+        rows = db.session.execute(
+            db.select(DocumentText.document_id,
+                      db.func.ts_headline(_language(), DocumentText.content, tsquery, SNIPPET_OPTIONS))
+            .where(DocumentText.document_id.in_(document_ids))
+        )
+    else:
+        rows = db.session.execute(
+            db.text(f"SELECT document_id, snippet({FTS_TABLE}, 0, '{MARK_START}', '{MARK_END}', '…', 24) "
+                    f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :fts_query'),
+            {'fts_query': _fts_query(text) or '""'}
+        )
+        wanted = {i.hex: i for i in document_ids}
+        rows = [(wanted[row[0]], row[1]) for row in rows if row[0] in wanted]
+    return {document_id: _highlight(snippet) for document_id, snippet in rows}
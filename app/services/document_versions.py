@@ -0,0 +1,122 @@
+"""Document version chains and the current version of each document.
+
+A new upload of a type the loan has one of (SINGLE_VERSION_TYPES: the
+contracts, the title deed, the appraisal) becomes the next version of the
+loan's current document of that type: it points at it with parent_id and
+takes over is_current. The partial unique index ux_documents_current keeps
+at most one current row per (loan_id, document_type), so a checklist reads
+the current documents with one index lookup instead of guessing from
+version numbers and upload dates. Concurrent uploads for a loan (e.g. a
+double submit) are serialized on the loan row, so the second one chains
+onto the first even when the loan had no current document yet.
+
+A document's full history is read with one recursive query: up the
+parent_id links to the first version, then down to every later one.
+"""
+from itertools import groupby
+from ..models.document import Document, SINGLE_VERSION_TYPES
+from ..models.loan import Loan
+from ..extensions import db
+
+
+def current_document(loan_id, document_type, for_update=False):
+    query = Document.query.filter_by(loan_id=loan_id, document_type=document_type, is_current=True)
+    if for_update:
+        query = query.with_for_update()
+    return query.first()
+
+
+def current_documents(loan_id, document_types=SINGLE_VERSION_TYPES):
+    """{document type: current Document} for one loan."""
+    documents = Document.query.filter(
+        Document.loan_id == loan_id,
+        Document.document_type.in_(document_types),
+        Document.is_current == True
+    )
+    return {doc.document_type: doc for doc in documents}
+
+
+def add_document(document):
+    """Add a new upload to the session as the current version of its type.
+
+    Returns the document it supersedes, if any. The caller commits, which
+    releases the loan row lock. Where the database can't lock rows
+    (SQLite), the unique index rejects the loser with an IntegrityError.
+    """
+    previous = None
+    if document.document_type in SINGLE_VERSION_TYPES:
+        # Lock the loan, not the current document: there may be no current row to lock yet
+        db.session.execute(db.select(Loan.id).where(Loan.id == document.loan_id).with_for_update())
+        previous = current_document(document.loan_id, document.document_type)
+    if previous is not None:
+        previous.is_current = False
+        document.parent_id = previous.id
+        document.version = (previous.version or 1) + 1
+        # Demote the old row before inserting the new one, or the unique index rejects it
+        db.session.flush()
+    document.is_current = True
+    db.session.add(document)
+    return previous
+
+
+def version_history(document_id):
+    """Every version in a document's chain, oldest first, from one recursive query."""
+    ancestors = (
+        db.select(Document.id, Document.parent_id)
+        .where(Document.id == document_id)
+        .cte('ancestors', recursive=True)
+    )
+    ancestors = ancestors.union_all(
+        db.select(Document.id, Document.parent_id)
+        .join(ancestors, Document.id == ancestors.c.parent_id)
+    )
+    root = db.select(ancestors.c.id).where(ancestors.c.parent_id.is_(None)).scalar_subquery()
+
+    chain = db.select(Document.id).where(Document.id == root).cte('chain', recursive=True)
+    chain = chain.union_all(
+        db.select(Document.id).join(chain, Document.parent_id == chain.c.id)
+    )
+    return Document.query.filter(Document.id.in_(db.select(chain.c.id))).order_by(
+        Document.version, Document.created_at
+    ).all()
+
+
+def link_versions(dry_run=False):
+    """Chain existing documents of each single-version type per loan.
+
+    For databases that predate is_current: every loan's documents of a type
+    are ordered by version and upload date, linked through parent_id and
+    renumbered, and only the newest stays current. Returns the number of
+    documents changed.
+    """
+    documents = Document.query.filter(
+        Document.document_type.in_(SINGLE_VERSION_TYPES)
+    ).order_by(Document.loan_id, Document.document_type, Document.version, Document.created_at).all()
+
+    changed, promoted = 0, []
+    for _, group in groupby(documents, key=lambda d: (d.loan_id, d.document_type)):
+        group = list(group)
+        parent = None
+        for number, doc in enumerate(group, start=1):
+            parent_id = parent.id if parent else None
+            is_current = doc is group[-1]
+            if (doc.parent_id, doc.version, doc.is_current) != (parent_id, number, is_current):
+                doc.parent_id = parent_id
+                doc.version = number
+                if is_current and not doc.is_current:
+                    promoted.append(doc)
+                else:
+                    doc.is_current = is_current
+                changed += 1
+            parent = doc
+
+    # Demote before promoting, so the unique index holds at every statement
+    db.session.flush()
+    for doc in promoted:
+        doc.is_current = True
+
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    return changed
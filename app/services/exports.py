@@ -0,0 +1,269 @@
+"""Streaming CSV/XLSX exports of loans, payments, schedules and audit logs.
+
+Rows come from a server-side cursor (``yield_per``) and are written out as
+they arrive, so memory use does not grow with the number of rows. Only the
+selected columns are fetched, and tables are joined only when a selected
+column or filter needs them.
+
+    for chunk in iter_csv('payments', ['payment_date', 'amount'], {'search': 'ANC'}):
+        response.write(chunk)
+"""
+import csv
+import io
+import json
+import tempfile
+import uuid
+from ..models.audit import AuditLog
+from ..models.borrower import Borrower
+from ..models.loan import Loan
+from ..models.payment import Payment, PaymentSchedule
+from ..models.user import User
+from ..extensions import db
+
+YIELD_PER = 1000
+ROWS_PER_CHUNK = 500
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # XLSX export is optional
+    Workbook = None
+
+
+class ExportError(Exception):
+    pass
+
+
+def xlsx_available():
+    return Workbook is not None
+
+
+def _search_loans(search):
+    return db.or_(
+        Loan.loan_number.ilike(f'%{search}%'),
+        Borrower.full_name.ilike(f'%{search}%'),
+        Borrower.dpi.ilike(f'%{search}%'),
+        Borrower.email.ilike(f'%{search}%')
+    )
+
+
+class ExportSpec:
+    """Columns, joins and filters of one export.
+
+    columns maps name -> (header, expression, join name or None). joins maps
+    join name -> (function(select) -> select, join it depends on or None), in
+    the order they are applied. filters maps the request argument ->
+    (function(value) -> condition, join name or None).
+    """
+
+    def __init__(self, name, model, columns, default_columns, joins, filters, order_by):
+        self.name = name
+        self.model = model
+        self.columns = columns
+        self.default_columns = default_columns
+        self.joins = joins
+        self.filters = filters
+        self.order_by = order_by
+
+    def resolve_columns(self, names=None):
+        names = [n for n in (names or []) if n] or self.default_columns
+        unknown = [n for n in names if n not in self.columns]
+        if unknown:
+            raise ExportError(f'Unknown columns for {self.name}: {", ".join(unknown)}')
+        return names
+
+    def build_select(self, names, filters=None):
+        filters = {k: v for k, v in (filters or {}).items() if k in self.filters and v not in (None, '')}
+        needed = {self.columns[n][2] for n in names} | {self.filters[k][1] for k in filters}
+        for join_name in list(needed):
+            while join_name in self.joins:
+                join_name = self.joins[join_name][1]
+                needed.add(join_name)
+        stmt = db.select(*[self.columns[n][1].label(n) for n in names]).select_from(self.model)
+        for join_name, (join, _) in self.joins.items():
+            if join_name in needed:
+                stmt = join(stmt)
+        for key, value in filters.items():
+            stmt = stmt.where(self.filters[key][0](value))
+        return stmt.order_by(*self.order_by)
+
+
+EXPORTS = {
+    'loans': ExportSpec(
+        name='loans',
+        model=Loan,
+        columns={
+            'loan_number': ('Loan #', Loan.loan_number, None),
+            'borrower': ('Borrower', Borrower.full_name, 'borrower'),
+            'borrower_dpi': ('DPI', Borrower.dpi, 'borrower'),
+            'loan_amount': ('Amount', Loan.loan_amount, None),
+            'interest_rate': ('Monthly Rate', Loan.interest_rate, None),
+            'term_months': ('Term (months)', Loan.term_months, None),
+            'ltv': ('LTV', Loan.ltv, None),
+            'status': ('Status', Loan.status, None),
+            'disbursement_date': ('Disbursed', Loan.disbursement_date, None),
+            'maturity_date': ('Maturity', Loan.maturity_date, None),
+            'created_at': ('Created', Loan.created_at, None),
+        },
+        default_columns=['loan_number', 'borrower', 'loan_amount', 'term_months', 'ltv',
+                         'status', 'created_at'],
+        joins={'borrower': (lambda s: s.join(Borrower, Loan.borrower_id == Borrower.id), None)},
+        filters={
+            'status': (lambda v: Loan.status == v, None),
+            'search': (_search_loans, 'borrower'),
+        },
+        order_by=[Loan.created_at.desc()],
+    ),
+    'payments': ExportSpec(
+        name='payments',
+        model=Payment,
+        columns={
+            'payment_date': ('Date', Payment.payment_date, None),
+            'loan_number': ('Loan #', Loan.loan_number, 'loan'),
+            'borrower': ('Borrower', Borrower.full_name, 'borrower'),
+            'amount': ('Amount', Payment.amount, None),
+            'payment_type': ('Type', Payment.payment_type, None),
+            'payment_method': ('Method', Payment.payment_method, None),
+            'reference_number': ('Reference', Payment.reference_number, None),
+            'notes': ('Notes', Payment.notes, None),
+        },
+        default_columns=['payment_date', 'loan_number', 'borrower', 'amount', 'payment_type',
+                         'payment_method', 'reference_number'],
+        joins={
+            'loan': (lambda s: s.join(Loan, Payment.loan_id == Loan.id), None),
+            'borrower': (lambda s: s.join(Borrower, Loan.borrower_id == Borrower.id), 'loan'),
+        },
+        filters={
+            'search': (_search_loans, 'borrower'),
+        },
+        order_by=[Payment.payment_date.desc()],
+    ),
+    'schedules': ExportSpec(
+        name='schedules',
+        model=PaymentSchedule,
+        columns={
+            'loan_number': ('Loan #', Loan.loan_number, 'loan'),
+            'borrower': ('Borrower', Borrower.full_name, 'borrower'),
+            'payment_number': ('Installment', PaymentSchedule.payment_number, None),
+            'due_date': ('Due Date', PaymentSchedule.due_date, None),
+            'interest_due': ('Interest', PaymentSchedule.interest_due, None),
+            'principal_due': ('Principal', PaymentSchedule.principal_due, None),
+            'late_fee': ('Late Fee', PaymentSchedule.late_fee, None),
+            'is_paid': ('Paid', PaymentSchedule.is_paid, None),
+            'paid_date': ('Paid Date', PaymentSchedule.paid_date, None),
+        },
+        default_columns=['loan_number', 'payment_number', 'due_date', 'interest_due',
+                         'principal_due', 'late_fee', 'is_paid', 'paid_date'],
+        joins={
+            'loan': (lambda s: s.join(Loan, PaymentSchedule.loan_id == Loan.id), None),
+            'borrower': (lambda s: s.join(Borrower, Loan.borrower_id == Borrower.id), 'loan'),
+        },
+        filters={
+            'status': (lambda v: Loan.status == v, 'loan'),
+            'search': (_search_loans, 'borrower'),
+            'unpaid': (lambda v: PaymentSchedule.is_paid == False, None),
+        },
+        order_by=[PaymentSchedule.due_date, PaymentSchedule.payment_number],
+    ),
+    'audit_logs': ExportSpec(
+        name='audit_logs',
+        model=AuditLog,
+        columns={
+            'timestamp': ('Timestamp', AuditLog.timestamp, None),
+            'entity_type': ('Entity', AuditLog.entity_type, None),
+            'entity_id': ('Entity ID', AuditLog.entity_id, None),
+            'action': ('Action', AuditLog.action, None),
+            'user': ('User', User.email, 'user'),
+            'ip_address': ('IP Address', AuditLog.ip_address, None),
+            'old_values': ('Old Values', AuditLog.old_values, None),
+            'new_values': ('New Values', AuditLog.new_values, None),
+        },
+        default_columns=['timestamp', 'entity_type', 'entity_id', 'action', 'user', 'ip_address'],
+        joins={'user': (lambda s: s.outerjoin(User, AuditLog.user_id == User.id), None)},
+        filters={
+            'entity_type': (lambda v: AuditLog.entity_type == v, None),
+            'action': (lambda v: AuditLog.action == v, None),
+        },
+        order_by=[AuditLog.timestamp.desc()],
+    ),
+}
+
+
+def get_export(name):
+    spec = EXPORTS.get(name)
+    if spec is None:
+        raise ExportError(f'Unknown export: {name}')
+    return spec
+
+
+def iter_rows(name, columns=None, filters=None):
+    """Yield (headers, row iterator) for an export, streaming from the database."""
+    spec = get_export(name)
+    names = spec.resolve_columns(columns)
+    stmt = spec.build_select(names, filters).execution_options(yield_per=YIELD_PER)
+    headers = [spec.columns[n][0] for n in names]
+    return headers, ([_cell(v) for v in row] for row in db.session.execute(stmt))
+
+
+def _cell(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def iter_csv(name, columns=None, filters=None):
+    """Yield CSV text in chunks of ROWS_PER_CHUNK rows."""
+    headers, rows = iter_rows(name, columns, filters)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_csv(name, path, columns=None, filters=None):
+    """Stream an export to a CSV file. Returns the number of rows written."""
+    headers, rows = iter_rows(name, columns, filters)
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_xlsx(name, target, columns=None, filters=None):
+    """Stream an export into an XLSX workbook using openpyxl's write-only mode.
+
+    `target` is a path or a binary file object. Returns the number of rows.
+    """
+    if Workbook is None:
+        raise ExportError('XLSX export requires openpyxl (pip install openpyxl)')
+    headers, rows = iter_rows(name, columns, filters)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(name)
+    sheet.append(headers)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(target)
+    return count
+
+
+def xlsx_tempfile(name, columns=None, filters=None):
+    """Write an XLSX export to a spooled temp file and return it rewound."""
+    target = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    write_xlsx(name, target, columns, filters)
+    target.seek(0)
+    return target
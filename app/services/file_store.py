@@ -0,0 +1,243 @@
+"""Content-addressed store for uploaded files.
+
+Uploads are hashed as they are received (utils/uploads.py) and stored
+once per content under UPLOAD_FOLDER:
+
+    documents/3f/3fa2...c9.pdf
+    photos/a0/a01b...7e.jpg
+
+The same DPI copy or title deed uploaded for several loans or document
+versions is kept once and shared. A blob's references are the rows whose
+Document.file_path, PropertyPhoto.file_path or Property.title_pdf_path
+point at it; unreferenced blobs are removed by collect_garbage(), together
+with any photo renditions made from them. Files
+saved before the store existed (``<uuid>_<name>``) keep working and are
+left alone.
+"""
+import hashlib
+import os
+import re
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.utils import secure_filename
+from ..models.document import Document
+from ..models.property import Property, PropertyPhoto
+from ..extensions import db
+from ..utils.uploads import UploadFile, sniff_mime_type
+from .photo_pipeline import remove_renditions
+
+CHUNK_SIZE = 1024 * 1024
+STORE_FOLDERS = ('documents', 'photos')
+# Unreferenced blobs younger than this may belong to an upload whose row isn't committed yet
+GC_GRACE_SECONDS = 24 * 3600
+
+BLOB_RE = re.compile(r'^(?P<digest>[0-9a-f]{64})(?P<ext>\.[a-z0-9]+)?$')
+
+
+def _upload_folder():
+    return current_app.config['UPLOAD_FOLDER']
+
+
+def blob_path(digest, subfolder, extension=''):
+    """Path of a blob relative to UPLOAD_FOLDER."""
+    return os.path.join(subfolder, digest[:2], f'{digest}{extension}')
+
+
+def _extension(filename):
+    _, ext = os.path.splitext(secure_filename(filename or ''))
+    return ext.lower()
+
+
+class UploadError(Exception):
+    pass
+
+
+StoredFile = namedtuple('StoredFile', 'path size sha256 mime_type')
+
+
+def _fsync_dir(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def store_upload(file, subfolder='documents', allowed_types=None):
+    """Move an uploaded FileStorage into the store. Returns a StoredFile.
+
+    Uploads parsed by UploadRequest are already on disk with their size and
+    hash; anything else (e.g. a plain stream in a script) is copied into an
+    UploadFile in one chunked pass first. The file is fsynced and renamed
+    into place, so the store never holds a partial blob. Content that is
+    already stored is not written again. Raises UploadError when the sniffed
+    MIME type is not in allowed_types.
+    """
+    upload = file.stream
+    if not isinstance(upload, UploadFile):
+        upload = UploadFile()
+        upload.copy_from(file.stream)
+    try:
+        mime_type = sniff_mime_type(upload.head, file.filename)
+        if allowed_types and mime_type not in allowed_types:
+            raise UploadError(f'{file.filename} is not an accepted file type ({mime_type})')
+
+        digest = upload.sha256.hexdigest()
+        relative = blob_path(digest, subfolder, _extension(file.filename))
+        target = os.path.join(_upload_folder(), relative)
+        if os.path.exists(target):
+            os.utime(target)  # restart the GC grace period for the new reference
+        else:
+            upload.flush()
+            os.fsync(upload.fileno())
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(upload.path, target)
+            _fsync_dir(os.path.dirname(target))
+        return StoredFile(relative, upload.size, digest, mime_type)
+    finally:
+        if upload is not file.stream:
+            upload.close()
+
+
+def reference_counts(paths=None):
+    """Counter of relative path -> number of rows referring to it."""
+    references = db.union_all(
+        db.select(Document.file_path.label('path')),
+        db.select(PropertyPhoto.file_path.label('path')),
+        db.select(Property.title_pdf_path.label('path')).where(Property.title_pdf_path.isnot(None)),
+    ).subquery()
+    stmt = db.select(references.c.path, db.func.count()).group_by(references.c.path)
+    if paths is not None:
+        stmt = stmt.where(references.c.path.in_(list(paths)))
+    return Counter(dict(db.session.execute(stmt).all()))
+
+
+def iter_blobs():
+    """Yield (relative path, digest) for every blob in the store."""
+    root = _upload_folder()
+    for subfolder in STORE_FOLDERS:
+        base = os.path.join(root, subfolder)
+        if not os.path.isdir(base):
+            continue
+        for prefix in sorted(os.listdir(base)):
+            prefix_dir = os.path.join(base, prefix)
+            if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                continue
+            for name in sorted(os.listdir(prefix_dir)):
+                match = BLOB_RE.match(name)
+                if match and match['digest'].startswith(prefix):
+                    yield os.path.join(subfolder, prefix, name), match['digest']
+
+
+def release_file(relative_path):
+    """Delete a stored file once no row refers to it. Returns True if deleted."""
+    if not relative_path or reference_counts([relative_path])[relative_path]:
+        return False
+    full_path = os.path.join(_upload_folder(), relative_path)
+    remove_renditions(_upload_folder(), relative_path)
+    if os.path.exists(full_path):
+        os.remove(full_path)
+        return True
+    return False
+
+
+def collect_garbage(dry_run=False, grace_seconds=GC_GRACE_SECONDS):
+    """Remove blobs that no row refers to. Returns (removed paths, bytes freed)."""
+    referenced = reference_counts()
+    cutoff = time.time() - grace_seconds
+    removed, freed = [], 0
+    for relative, _ in iter_blobs():
+        if referenced[relative]:
+            continue
+        full_path = os.path.join(_upload_folder(), relative)
+        stat = os.stat(full_path)
+        if stat.st_mtime > cutoff:
+            continue
+        if not dry_run:
+            os.remove(full_path)
+            remove_renditions(_upload_folder(), relative)
+        removed.append(relative)
+        freed += stat.st_size
+    return removed, freed
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_store(workers=4):
+    """Re-hash every blob in parallel and check referenced files exist.
+
+    hashlib releases the GIL on large buffers, so threads hash in parallel.
+    Returns a dict with checked, corrupt (paths whose content no longer
+    matches their name) and missing (referenced paths with no file).
+    """
+    root = _upload_folder()
+    blobs = list(iter_blobs())
+
+    def check(item):
+        relative, expected = item
+        return relative, file_digest(os.path.join(root, relative)) == expected
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        corrupt = [relative for relative, ok in executor.map(check, blobs) if not ok]
+
+    missing = sorted(path for path in reference_counts()
+                     if not os.path.exists(os.path.join(root, path)))
+    return {'checked': len(blobs), 'corrupt': corrupt, 'missing': missing}
+
+
+def _save_spooled(file, folder):
+    """The previous upload path: save a spooled upload, then seek for size and re-read to hash."""
+    path = os.path.join(folder, f'spooled-{os.urandom(8).hex()}')
+    file.save(path)
+    size = file.stream.seek(0, 2)
+    return size, file_digest(path)
+
+
+def benchmark_uploads(size_mb=16, runs=3):
+    """Time and peak Python memory of parsing and storing a size_mb upload.
+
+    Compares Werkzeug's spooled parsing followed by save/seek/re-hash with
+    UploadRequest + store_upload. Returns [(label, seconds, peak bytes)]
+    averaged over runs. Files are written to a scratch folder that is removed.
+    """
+    import io
+    import tempfile
+    import tracemalloc
+    from flask import Request
+    from werkzeug.test import EnvironBuilder
+    from ..utils.uploads import UploadRequest
+
+    root = _upload_folder()
+    results = []
+    with tempfile.TemporaryDirectory(prefix='.benchmark-', dir=root) as folder:
+        subfolder = os.path.relpath(folder, root)
+        methods = (
+            ('spooled + save', Request, lambda file: _save_spooled(file, folder)),
+            ('streaming', UploadRequest, lambda file: store_upload(file, subfolder)),
+        )
+        for label, request_class, save in methods:
+            seconds, peak = 0.0, 0
+            for _ in range(runs):
+                payload = os.urandom(size_mb * 1024 * 1024)  # fresh content, so nothing dedupes
+                environ = EnvironBuilder(
+                    method='POST', data={'file': (io.BytesIO(payload), 'benchmark.pdf')}
+                ).get_environ()
+                del payload
+                tracemalloc.start()
+                started = time.perf_counter()
+                request = request_class(environ)
+                save(request.files['file'])
+                seconds += time.perf_counter() - started
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                tracemalloc.stop()
+                request.close()
+            results.append((label, seconds / runs, peak))
+    return results
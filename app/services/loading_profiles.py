@@ -0,0 +1,115 @@
+"""Named relationship loading profiles for list and detail queries.
+
+Each profile bundles the eager-loading and column options a page needs so
+that rendering it never falls back to one lazy query per row. Routes pick a
+profile explicitly:
+
+    loans = LoanListProfile.apply(Loan.query).order_by(...).paginate(...)
+"""
+from sqlalchemy.orm import joinedload, load_only
+from ..models.borrower import Borrower
+from ..models.document import Document
+from ..models.loan import Loan, LoanStatus
+from ..models.payment import Payment
+from ..models.property import Property
+from ..extensions import db
+
+
+class LoadingProfile:
+    """Base class: subclasses return their loader options from get_options()."""
+
+    @classmethod
+    def get_options(cls):
+        return []
+
+    @classmethod
+    def apply(cls, query):
+        return query.options(*cls.get_options())
+
+
+class LoanListProfile(LoadingProfile):
+    """loans.index: loan columns shown in the table plus the borrower name."""
+
+    @classmethod
+    def get_options(cls):
+        return [
+            load_only(Loan.id, Loan.loan_number, Loan.borrower_id, Loan.loan_amount,
+                      Loan.term_months, Loan.ltv, Loan.status, Loan.created_at),
+            joinedload(Loan.borrower).load_only(Borrower.id, Borrower.full_name),
+        ]
+
+
+class ActivationQueueProfile(LoadingProfile):
+    """loans.ready_to_activate: loan columns plus approval date and borrower name."""
+
+    @classmethod
+    def get_options(cls):
+        return [
+            load_only(Loan.id, Loan.loan_number, Loan.borrower_id, Loan.loan_amount,
+                      Loan.term_months, Loan.status, Loan.approved_at),
+            joinedload(Loan.borrower).load_only(Borrower.id, Borrower.full_name),
+        ]
+
+
+class LoanDetailProfile(LoadingProfile):
+    """loans.view / borrower portal: every many-to-one the page renders."""
+
+    @classmethod
+    def get_options(cls):
+        return [
+            joinedload(Loan.borrower),
+            joinedload(Loan.collateral),
+            joinedload(Loan.product),
+        ]
+
+
+class PaymentListProfile(LoadingProfile):
+    """payments.index: each payment with its loan number and borrower name."""
+
+    @classmethod
+    def get_options(cls):
+        return [
+            joinedload(Payment.loan)
+            .load_only(Loan.id, Loan.loan_number, Loan.borrower_id)
+            .joinedload(Loan.borrower)
+            .load_only(Borrower.id, Borrower.full_name),
+        ]
+
+
+class PropertyListProfile(LoadingProfile):
+    """collateral.index: registry columns plus the owner's name."""
+
+    @classmethod
+    def get_options(cls):
+        return [
+            load_only(Property.id, Property.borrower_id, Property.property_type,
+                      Property.finca, Property.folio, Property.libro,
+                      Property.department, Property.municipality,
+                      Property.market_value, Property.verified, Property.created_at),
+            joinedload(Property.borrower).load_only(Borrower.id, Borrower.full_name),
+        ]
+
+
+class DocumentListProfile(LoadingProfile):
+    """legal.index: each document with its loan number."""
+
+    @classmethod
+    def get_options(cls):
+        return [
+            joinedload(Document.loan).load_only(Loan.id, Loan.loan_number),
+        ]
+
+
+def property_ids_with_active_loans(property_ids):
+    """Batch form of Property.has_active_loan() for a page of properties."""
+    if not property_ids:
+        return set()
+    rows = db.session.query(Loan.property_id).filter(
+        Loan.property_id.in_(property_ids),
+        Loan.status.in_([
+            LoanStatus.ACTIVE.value,
+            LoanStatus.APPROVED.value,
+            LoanStatus.UNDER_REVIEW.value
+        ])
+    ).distinct().all()
+    return {row.property_id for row in rows}
@@ -3,6 +3,7 @@ from dateutil.relativedelta import relativedelta
 from ..models.loan import Loan, LoanStatus, LoanProduct
 from ..models.payment import PaymentSchedule
 from ..extensions import db
+from .document_checklist import evaluate_checklist
 
 
 class LoanValidationError(Exception):
@@ -44,14 +45,19 @@ def validate_loan_for_approval(loan):
     return errors
 
 
-def validate_loan_for_activation(loan):
-    """Validate loan before activation/disbursement."""
+def validate_loan_for_activation(loan, documents_complete=None):
+    """Validate loan before activation/disbursement.
+
+    Pass documents_complete when the document checklist is already loaded.
+    """
     errors = []
 
     if loan.status != LoanStatus.APPROVED.value:
         errors.append('Loan must be approved before activation')
 
-    if not loan.all_documents_complete():
+    if documents_complete is None:
+        documents_complete = evaluate_checklist(loan.id).is_complete
+    if not documents_complete:
         errors.append('All legal documents must be executed')
 
     return errors
@@ -138,18 +144,30 @@ def calculate_loan_ltv(loan_amount, property_value):
 
 def get_loan_summary(loan):
     """Get comprehensive loan summary."""
+    return summarize_loan(loan, loan.schedule.all(), loan.payments.all())
+
+
+def summarize_loan(loan, schedule, payments, today=None):
+    """Build the loan summary from an already-loaded schedule and payments."""
+    today = today or date.today()
+
     total_paid_interest = sum(
-        p.amount for p in loan.payments
+        p.amount for p in payments
         if p.payment_type == 'Interest'
     )
     total_paid_principal = sum(
-        p.amount for p in loan.payments
+        p.amount for p in payments
         if p.payment_type == 'Principal'
     )
     total_paid_fees = sum(
-        p.amount for p in loan.payments
+        p.amount for p in payments
         if p.payment_type == 'LateFee'
     )
+    interest_due_to_date = sum(s.interest_due for s in schedule if s.due_date <= today)
+
+    unpaid_due_dates = [s.due_date for s in schedule if not s.is_paid]
+    first_unpaid = min(unpaid_due_dates) if unpaid_due_dates else None
+    days_past_due = (today - first_unpaid).days if first_unpaid and first_unpaid < today else 0
 
     return {
         'loan_amount': loan.loan_amount,
@@ -158,7 +176,7 @@ def get_loan_summary(loan):
         'paid_interest': total_paid_interest,
         'paid_principal': total_paid_principal,
         'paid_fees': total_paid_fees,
-        'outstanding_principal': loan.outstanding_principal,
-        'outstanding_interest': loan.outstanding_interest,
-        'days_past_due': loan.days_past_due
+        'outstanding_principal': loan.loan_amount - total_paid_principal,
+        'outstanding_interest': interest_due_to_date - total_paid_interest,
+        'days_past_due': days_past_due
     }
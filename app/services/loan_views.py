@@ -0,0 +1,89 @@
+"""View models that load everything a page renders up front.
+
+Templates receive plain dicts and lists, so the number of queries a page
+runs is fixed by the builder rather than by what the template touches.
+"""
+from datetime import date
+from decimal import Decimal
+from ..models.document import Document, ExecutionStatus
+from ..models.payment import Payment, PaymentSchedule
+from .document_checklist import DocumentChecklist
+from .loan_service import summarize_loan
+
+
+def _schedule_row(item, today):
+    late_fee = item.late_fee or Decimal('0')
+    principal_due = item.principal_due or Decimal('0')
+    is_overdue = not item.is_paid and item.due_date < today
+    return {
+        'id': item.id,
+        'payment_number': item.payment_number,
+        'due_date': item.due_date,
+        'interest_due': item.interest_due,
+        'principal_due': principal_due,
+        'late_fee': late_fee,
+        'total_due': principal_due + item.interest_due + late_fee,
+        'is_paid': item.is_paid,
+        'paid_date': item.paid_date,
+        'is_overdue': is_overdue,
+    }
+
+
+def _payment_row(payment):
+    return {
+        'id': payment.id,
+        'payment_date': payment.payment_date,
+        'payment_type': payment.payment_type,
+        'amount': payment.amount,
+        'payment_method': payment.payment_method,
+        'reference_number': payment.reference_number,
+    }
+
+
+def _document_row(document):
+    return {
+        'id': document.id,
+        'document_type': document.document_type,
+        'name': document.name,
+        'version': document.version,
+        'is_current': document.is_current,
+        'execution_status': document.execution_status,
+        'is_executed': document.execution_status == ExecutionStatus.EXECUTED.value,
+        'created_at': document.created_at,
+    }
+
+
+class LoanDetailView:
+    """Schedule, payments, documents, checklist and summary for one loan.
+
+    Built with three queries on top of the loan itself (load the loan with
+    LoanDetailProfile so borrower, collateral and product come with it).
+    """
+    RECENT_PAYMENTS = 10
+
+    def __init__(self, loan, schedule, payments, documents, today=None):
+        today = today or date.today()
+        self.loan = loan
+        self.schedule = [_schedule_row(item, today) for item in schedule]
+        self.payments = [_payment_row(p) for p in payments]
+        self.recent_payments = self.payments[:self.RECENT_PAYMENTS]
+        self.documents = [_document_row(d) for d in documents]
+        checklist = DocumentChecklist.from_documents(self.documents)
+        self.checklist = checklist.items
+        self.checklist_complete_count = checklist.complete_count
+        self.documents_complete = checklist.is_complete
+        self.summary = summarize_loan(loan, schedule, payments, today=today)
+        self.days_past_due = self.summary['days_past_due']
+
+    @classmethod
+    def build(cls, loan):
+        schedule = PaymentSchedule.query.filter_by(loan_id=loan.id).order_by(
+            PaymentSchedule.payment_number
+        ).all()
+        payments = Payment.query.filter_by(loan_id=loan.id).order_by(
+            Payment.payment_date.desc(), Payment.created_at.desc()
+        ).all()
+        documents = Document.query.filter_by(loan_id=loan.id).order_by(
+            Document.created_at
+        ).all()
+        return cls(loan, schedule, payments, documents)
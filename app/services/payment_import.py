@@ -0,0 +1,242 @@
+"""Bulk import of payments from bank-statement CSV exports.
+
+Rows are read as a stream and processed in chunks. Loans are matched through
+a preloaded loan-number index, duplicates are checked against one query per
+chunk, and all payments, schedule allocations and payoff checks are written
+in a single transaction.
+"""
+import csv
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from ..models.audit import AuditLog
+from ..models.loan import Loan, LoanStatus
+from ..models.payment import Payment, PaymentType
+from ..extensions import db
+from ..utils.ids import uuid7
+from .allocation_service import allocate_payments
+from .payment_service import close_paid_off_loans
+
+CHUNK_SIZE = 2000
+
+# Same statuses payments.record accepts
+IMPORTABLE_STATUSES = [
+    LoanStatus.ACTIVE.value,
+    LoanStatus.MATURED.value,
+    LoanStatus.DEFAULTED.value
+]
+
+# Sequence numbers grow past four digits after 9999 loans in a month (Loan.generate_loan_number)
+LOAN_NUMBER_RE = re.compile(r'ANC-\d{6}-\d{4,}', re.IGNORECASE)
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y')
+
+# Accepted header names (lowercase) for each field
+COLUMN_ALIASES = {
+    'date': ('date', 'fecha', 'payment_date'),
+    'amount': ('amount', 'monto', 'credit', 'credito'),
+    'reference': ('reference', 'referencia', 'reference_number', 'description', 'descripcion'),
+    'loan_number': ('loan_number', 'loan', 'prestamo'),
+    'payment_type': ('payment_type', 'type', 'tipo'),
+    'payment_method': ('payment_method', 'method', 'metodo'),
+}
+
+RESULT_COLUMNS = ['row', 'result', 'loan_number', 'payment_date', 'amount',
+                  'reference', 'payment_id', 'message']
+
+
+class PaymentImportError(Exception):
+    pass
+
+
+def read_bank_rows(stream):
+    """Yield (row_number, fields) from a CSV bank export, one row at a time."""
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames:
+        raise PaymentImportError('File has no header row')
+
+    header = {name.strip().lower(): name for name in reader.fieldnames if name}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in header:
+                columns[field] = header[alias]
+                break
+
+    if 'date' not in columns or 'amount' not in columns:
+        raise PaymentImportError('File must have date and amount columns')
+    if 'reference' not in columns and 'loan_number' not in columns:
+        raise PaymentImportError('File must have a reference or loan_number column')
+
+    for row_number, raw in enumerate(reader, start=2):
+        yield row_number, {field: (raw.get(column) or '').strip()
+                           for field, column in columns.items()}
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def parse_date(value):
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Unrecognized date "{value}"')
+
+
+def parse_amount(value):
+    cleaned = value.replace('Q', '').replace(',', '').strip()
+    try:
+        amount = Decimal(cleaned).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f'Unrecognized amount "{value}"')
+    # NaN gets through quantize() but can't be compared
+    if not amount.is_finite():
+        raise ValueError(f'Unrecognized amount "{value}"')
+    if amount <= 0:
+        raise ValueError('Amount must be positive')
+    return amount
+
+
+def _parse_row(fields, loan_index):
+    """Return a normalized payment dict, with loan_id None when unmatched."""
+    payment_type = fields.get('payment_type') or PaymentType.INTEREST.value
+    if payment_type not in {t.value for t in PaymentType}:
+        raise ValueError(f'Unknown payment type "{payment_type}"')
+
+    loan_number = fields.get('loan_number', '').upper()
+    reference = fields.get('reference', '')
+    if not loan_number:
+        match = LOAN_NUMBER_RE.search(reference)
+        loan_number = match.group(0).upper() if match else ''
+
+    return {
+        'loan_number': loan_number,
+        'loan_id': loan_index.get(loan_number),
+        'payment_date': parse_date(fields['date']),
+        'amount': parse_amount(fields['amount']),
+        'reference_number': reference[:100] or None,
+        'payment_type': payment_type,
+        'payment_method': fields.get('payment_method') or 'Transfer',
+    }
+
+
+def _duplicate_key(item):
+    if item['reference_number']:
+        return (item['loan_id'], 'ref', item['reference_number'])
+    return (item['loan_id'], item['payment_date'], item['amount'])
+
+
+def _existing_keys(items):
+    """Duplicate keys of payments already recorded for a chunk's loans."""
+    if not items:
+        return set()
+    loan_ids = {item['loan_id'] for item in items}
+    dates = [item['payment_date'] for item in items]
+    rows = db.session.execute(
+        db.select(Payment.loan_id, Payment.payment_date, Payment.amount, Payment.reference_number)
+        .where(Payment.loan_id.in_(loan_ids),
+               Payment.payment_date.between(min(dates), max(dates)))
+    )
+    keys = set()
+    for row in rows:
+        if row.reference_number:
+            keys.add((row.loan_id, 'ref', row.reference_number))
+        keys.add((row.loan_id, row.payment_date, row.amount))
+    return keys
+
+
+def import_payments(stream, results, recorded_by, dry_run=False):
+    """Import a bank CSV from `stream`, writing a per-row result CSV to `results`.
+
+    Returns a dict of counts by result (matched, unmatched, duplicate, invalid)
+    plus schedule_items_paid and loans_closed.
+    """
+    loan_index = {
+        number.upper(): loan_id for loan_id, number in db.session.execute(
+            db.select(Loan.id, Loan.loan_number).where(Loan.status.in_(IMPORTABLE_STATUSES))
+        )
+    }
+
+    writer = csv.writer(results)
+    writer.writerow(RESULT_COLUMNS)
+    counts = {'matched': 0, 'unmatched': 0, 'duplicate': 0, 'invalid': 0}
+    seen = set()
+    recorded = []
+    touched_loans = set()
+
+    for chunk in _chunks(read_bank_rows(stream), CHUNK_SIZE):
+        parsed = []
+        for row_number, fields in chunk:
+            try:
+                parsed.append((row_number, _parse_row(fields, loan_index)))
+            except ValueError as e:
+                counts['invalid'] += 1
+                writer.writerow([row_number, 'invalid', fields.get('loan_number', ''),
+                                 fields.get('date', ''), fields.get('amount', ''),
+                                 fields.get('reference', ''), '', str(e)])
+
+        existing = _existing_keys([item for _, item in parsed if item['loan_id']])
+        payments = []
+        audit_entries = []
+        for row_number, item in parsed:
+            result, payment_id, message = 'matched', '', ''
+            if not item['loan_id']:
+                result = 'unmatched'
+                message = 'No active loan found for reference'
+            else:
+                key = _duplicate_key(item)
+                if key in seen or key in existing:
+                    result = 'duplicate'
+                    message = 'Payment already recorded'
+                else:
+                    seen.add(key)
+                    payment_id = uuid7()
+                    payments.append({
+                        'id': payment_id,
+                        'loan_id': item['loan_id'],
+                        'amount': item['amount'],
+                        'payment_type': item['payment_type'],
+                        'payment_date': item['payment_date'],
+                        'payment_method': item['payment_method'],
+                        'reference_number': item['reference_number'],
+                        'notes': f'Imported from bank statement (row {row_number})',
+                        'recorded_by': recorded_by,
+                    })
+                    audit_entries.append({
+                        'id': uuid7(),
+                        'entity_type': 'Payment',
+                        'entity_id': payment_id,
+                        'action': 'imported',
+                        'user_id': recorded_by,
+                        'timestamp': datetime.utcnow(),
+                        'new_values': {'amount': str(item['amount']), 'type': item['payment_type']},
+                    })
+                    touched_loans.add(item['loan_id'])
+
+            counts[result] += 1
+            writer.writerow([row_number, result, item['loan_number'], item['payment_date'],
+                             item['amount'], item['reference_number'] or '', payment_id, message])
+
+        if payments and not dry_run:
+            db.session.execute(db.insert(Payment), payments)
+            db.session.execute(db.insert(AuditLog), audit_entries)
+            recorded.extend(payments)
+
+    counts['schedule_items_paid'] = 0
+    counts['loans_closed'] = 0
+    if dry_run:
+        db.session.rollback()
+    else:
+        _, counts['schedule_items_paid'] = allocate_payments(recorded)
+        counts['loans_closed'] = close_paid_off_loans(touched_loans)
+        db.session.commit()
+    return counts
@@ -2,7 +2,9 @@ from datetime import date
 from decimal import Decimal
 from ..models.payment import Payment, PaymentSchedule, PaymentType
 from ..models.loan import Loan, LoanStatus
+from ..models.statements import unpaid_schedule_count
 from ..extensions import db
+from .allocation_service import allocate_payment, BULK_BATCH_SIZE
 
 
 def record_payment(loan, amount, payment_type, payment_date, recorded_by,
@@ -21,9 +23,8 @@ def record_payment(loan, amount, payment_type, payment_date, recorded_by,
 
     db.session.add(payment)
 
-    # Auto-apply to schedule if interest payment
-    if payment_type == PaymentType.INTEREST.value:
-        apply_payment_to_schedule(loan, amount, payment_date)
+    # Spread the payment over the unpaid schedule (late fee -> interest -> principal)
+    allocate_payment(payment)
 
     # Check if loan is fully paid
     check_loan_payoff(loan)
@@ -31,24 +32,23 @@ def record_payment(loan, amount, payment_type, payment_date, recorded_by,
     return payment
 
 
-def apply_payment_to_schedule(loan, amount, payment_date):
-    """Apply an interest payment to the payment schedule."""
-    remaining = Decimal(str(amount))
-
-    # Find unpaid schedule items
-    unpaid_items = loan.schedule.filter_by(is_paid=False).order_by(
-        PaymentSchedule.due_date
-    ).all()
-
-    for item in unpaid_items:
-        if remaining <= 0:
-            break
-
-        item_total = item.interest_due + item.late_fee
-        if remaining >= item_total:
-            item.mark_paid(payment_date)
-            remaining -= item_total
-        # Partial payments don't mark as paid
+def close_paid_off_loans(loan_ids):
+    """Set-based check_loan_payoff: close every loan with no unpaid items."""
+    loan_ids = list(loan_ids)
+    unpaid_exists = db.select(PaymentSchedule.id).where(
+        PaymentSchedule.loan_id == Loan.id,
+        PaymentSchedule.is_paid == False
+    ).exists()
+    closed = 0
+    for start in range(0, len(loan_ids), BULK_BATCH_SIZE):
+        result = db.session.execute(
+            db.update(Loan)
+            .where(Loan.id.in_(loan_ids[start:start + BULK_BATCH_SIZE]), ~unpaid_exists)
+            .values(status=LoanStatus.CLOSED.value)
+            .execution_options(synchronize_session=False)
+        )
+        closed += result.rowcount
+    return closed
 
 
 def calculate_late_fees(loan):
@@ -72,7 +72,7 @@ def calculate_late_fees(loan):
 def check_loan_payoff(loan):
     """Check if loan is fully paid and update status."""
     # Check if all schedule items are paid
-    unpaid = loan.schedule.filter_by(is_paid=False).count()
+    unpaid = db.session.execute(unpaid_schedule_count(loan.id)).scalar()
 
     if unpaid == 0:
         loan.status = LoanStatus.CLOSED.value
@@ -0,0 +1,165 @@
+"""Compressed display copies and thumbnails of property photos.
+
+Originals are kept as uploaded. Next to them, each photo gets EXIF-free
+JPEG renditions capped at PHOTO_SIZES pixels on the longest side:
+
+    photos/3f/3fa2...c9.jpg                 original
+    photos/derived/3fa2...c9/full.jpg       <= 2048px
+    photos/derived/3fa2...c9/large.jpg      <= 1024px
+    photos/derived/3fa2...c9/medium.jpg     <= 640px
+    photos/derived/3fa2...c9/thumb.jpg      <= 320px
+
+Renditions are keyed by the original's file name, so identical uploads
+share them. New uploads are processed on a small background thread pool
+(Pillow releases the GIL while decoding and resizing); existing photos are
+backfilled by ``flask process-photos`` on a process pool. Originals are
+never served, since they keep their EXIF (GPS position, camera serial);
+until a rendition exists a placeholder is shown instead.
+
+Requires Pillow (optional dependency).
+"""
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from flask import current_app
+from ..models.property import PropertyPhoto
+from ..extensions import db
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Photo processing is optional
+    Image = ImageOps = None
+
+DERIVED_FOLDER = 'derived'
+PHOTO_SIZES = {
+    'full': 2048,
+    'large': 1024,
+    'medium': 640,
+    'thumb': 320,
+}
+JPEG_QUALITY = 82
+BACKGROUND_WORKERS = 2
+
+_executor = None
+
+
+class PhotoProcessingError(Exception):
+    pass
+
+
+def photos_available():
+    return Image is not None
+
+
+def rendition_path(relative_path, size):
+    """Path of a photo rendition relative to UPLOAD_FOLDER."""
+    subfolder = relative_path.split(os.sep, 1)[0]
+    stem = os.path.splitext(os.path.basename(relative_path))[0]
+    return os.path.join(subfolder, DERIVED_FOLDER, stem, f'{size}.jpg')
+
+
+def remove_renditions(upload_folder, relative_path):
+    folder = os.path.join(upload_folder, os.path.dirname(rendition_path(relative_path, 'full')))
+    if os.path.isdir(folder):
+        shutil.rmtree(folder)
+
+
+def _flatten(image):
+    """RGB copy of an image, with any transparency on white."""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        rgba = image.convert('RGBA')
+        background = Image.new('RGB', rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def process_photo(upload_folder, relative_path, force=False):
+    """Write every missing rendition of one photo. Returns the number written.
+
+    Needs no app context, so it can run in a pool worker.
+    """
+    source = os.path.join(upload_folder, relative_path)
+    targets = {size: os.path.join(upload_folder, rendition_path(relative_path, size))
+               for size in PHOTO_SIZES}
+    if not force:
+        targets = {size: path for size, path in targets.items() if not os.path.exists(path)}
+    if not targets:
+        return 0
+
+    with Image.open(source) as original:
+        # Apply the EXIF orientation, then drop EXIF (GPS, camera serials) from the copies
+        image = _flatten(ImageOps.exif_transpose(original))
+
+    os.makedirs(os.path.dirname(next(iter(targets.values()))), exist_ok=True)
+    # Largest first, each resized from the previous one
+    for size in sorted(targets, key=PHOTO_SIZES.get, reverse=True):
+        image.thumbnail((PHOTO_SIZES[size], PHOTO_SIZES[size]), Image.LANCZOS)
+        tmp = f'{targets[size]}.tmp'
+        image.save(tmp, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        os.replace(tmp, targets[size])
+    return len(targets)
+
+
+def _process_quietly(upload_folder, relative_path, logger):
+    try:
+        process_photo(upload_folder, relative_path)
+    except Exception as e:
+        # Originals are still served; the backfill retries missing renditions
+        logger.error(f'Photo processing failed for {relative_path}: {str(e)}')
+
+
+def schedule_photo_processing(relative_path):
+    """Process a newly uploaded photo in the background. No-op without Pillow."""
+    global _executor
+    if Image is None:
+        return None
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS,
+                                       thread_name_prefix='photo-pipeline')
+    return _executor.submit(_process_quietly, current_app.config['UPLOAD_FOLDER'], relative_path,
+                            current_app.logger)
+
+
+def served_path(relative_path, size):
+    """The rendition if it exists yet, otherwise None."""
+    rendition = rendition_path(relative_path, size)
+    if os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], rendition)):
+        return rendition
+    return None
+
+
+def backfill_photos(workers=None, force=False, progress=None):
+    """Write missing renditions for every stored photo on a process pool.
+
+    Returns a dict with photos, written (renditions), errors and seconds.
+    """
+    if Image is None:
+        raise PhotoProcessingError('Photo processing requires Pillow (pip install Pillow)')
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    paths = [row[0] for row in db.session.execute(
+        db.select(PropertyPhoto.file_path).distinct().order_by(PropertyPhoto.file_path)
+    )]
+    db.session.remove()
+
+    started = time.perf_counter()
+    written, errors, done = 0, [], 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(process_photo, upload_folder, path, force): path
+                   for path in paths}
+        for future in as_completed(futures):
+            done += 1
+            try:
+                written += future.result()
+            except Exception as e:
+                errors.append(f'{futures[future]}: {e}')
+            if progress:
+                progress(done, len(paths))
+
+    return {
+        'photos': len(paths),
+        'written': written,
+        'errors': errors,
+        'seconds': time.perf_counter() - started,
+    }
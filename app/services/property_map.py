@@ -0,0 +1,108 @@
+"""Bounding-box GeoJSON for the collateral map, clustered in SQL.
+
+Points inside the requested box are snapped to a grid whose cell size
+follows the map zoom (ST_SnapToGrid) and aggregated per cell, so the browser
+receives at most a few hundred clusters however many properties there are.
+From DETAIL_ZOOM onwards individual properties are returned instead.
+"""
+from geoalchemy2 import Geography, Geometry
+from ..models.loan import Loan
+from ..models.property import Property
+from ..extensions import db
+
+# Cluster cells are about this many screen pixels wide (256px tiles)
+CLUSTER_PIXELS = 64
+DETAIL_ZOOM = 15
+MAX_FEATURES = 5000
+
+
+class MapQueryError(Exception):
+    pass
+
+
+def parse_bbox(value):
+    """'min_lon,min_lat,max_lon,max_lat' -> tuple of floats."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in value.split(','))
+    except (AttributeError, ValueError):
+        raise MapQueryError('bbox must be min_lon,min_lat,max_lon,max_lat')
+    if not (-180 <= min_lon < max_lon <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise MapQueryError('bbox is out of range')
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def cell_size(zoom):
+    """Grid cell size in degrees for a zoom level."""
+    return 360.0 / (256 * 2 ** zoom) * CLUSTER_PIXELS
+
+
+def _filters(bbox, loan_status=None, department=None):
+    envelope = db.cast(db.func.ST_MakeEnvelope(*bbox, 4326), Geography)
+    conditions = [
+        Property.location.isnot(None),
+        db.func.ST_Intersects(Property.location, envelope),  # uses the GIST index
+    ]
+    if department:
+        conditions.append(Property.department == department)
+    if loan_status:
+        conditions.append(
+            db.select(Loan.id).where(Loan.property_id == Property.id,
+                                     Loan.status == loan_status).exists()
+        )
+    return conditions
+
+
+def _feature(lon, lat, properties):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [float(lon), float(lat)]},
+        'properties': properties,
+    }
+
+
+def property_features(bbox, zoom, loan_status=None, department=None):
+    """GeoJSON FeatureCollection of clusters (or single properties) in bbox."""
+    geom = db.cast(Property.location, Geometry)
+    conditions = _filters(bbox, loan_status, department)
+
+    if zoom >= DETAIL_ZOOM:
+        rows = db.session.execute(
+            db.select(Property.id, Property.finca, Property.folio, Property.libro,
+                      Property.property_type, Property.market_value,
+                      db.func.ST_X(geom).label('lon'), db.func.ST_Y(geom).label('lat'))
+            .where(*conditions)
+            .limit(MAX_FEATURES)
+        )
+        features = [
+            _feature(row.lon, row.lat, {
+                'id': str(row.id),
+                'count': 1,
+                'registry_number': f'{row.finca}/{row.folio}/{row.libro}',
+                'property_type': row.property_type,
+                'market_value': float(row.market_value),
+            })
+            for row in rows
+        ]
+    else:
+        cell = db.func.ST_SnapToGrid(geom, cell_size(zoom))
+        center = db.func.ST_Centroid(db.func.ST_Collect(geom))
+        rows = db.session.execute(
+            db.select(db.func.count().label('count'),
+                      db.func.ST_X(center).label('lon'), db.func.ST_Y(center).label('lat'),
+                      db.func.sum(Property.market_value).label('market_value'),
+                      db.func.min(db.cast(Property.id, db.String)).label('sample_id'))
+            .where(*conditions)
+            .group_by(cell)
+            .limit(MAX_FEATURES)
+        )
+        features = [
+            _feature(row.lon, row.lat, {
+                'count': row.count,
+                'market_value': float(row.market_value or 0),
+                # A single-property cell links straight to it
+                'id': row.sample_id if row.count == 1 else None,
+            })
+            for row in rows
+        ]
+
+    return {'type': 'FeatureCollection', 'features': features}
@@ -0,0 +1,96 @@
+"""EXPLAIN-based checks that hot queries are served by an index."""
+import json
+import uuid
+from datetime import date
+from ..models.borrower import Borrower
+from ..models.collection import CollectionAction
+from ..models.document import Document
+from ..models.loan import Loan
+from ..models.payment import Payment, PaymentSchedule, PaymentType
+from ..models.property import Property
+from ..extensions import db
+
+
+def get_hot_queries():
+    """Return (name, statement) pairs for the queries every page depends on."""
+    sample_id = uuid.uuid4()
+    today = date.today()
+    return [
+        ('loan_next_unpaid', db.select(PaymentSchedule).filter(
+            PaymentSchedule.loan_id == sample_id,
+            PaymentSchedule.is_paid == False
+        ).order_by(PaymentSchedule.due_date).limit(1)),
+        ('loan_schedule', db.select(PaymentSchedule).filter(
+            PaymentSchedule.loan_id == sample_id
+        ).order_by(PaymentSchedule.payment_number)),
+        ('overdue_schedule', db.select(PaymentSchedule).filter(
+            PaymentSchedule.is_paid == False,
+            PaymentSchedule.due_date < today
+        )),
+        ('loan_payment_sum', db.select(db.func.sum(Payment.amount)).filter(
+            Payment.loan_id == sample_id,
+            Payment.payment_type == PaymentType.INTEREST.value
+        )),
+        ('loan_payments_recent', db.select(Payment).filter(
+            Payment.loan_id == sample_id
+        ).order_by(Payment.payment_date.desc()).limit(10)),
+        ('payments_index', db.select(Payment).order_by(Payment.payment_date.desc()).limit(30)),
+        ('loans_index', db.select(Loan).order_by(Loan.created_at.desc()).limit(20)),
+        ('borrower_loans', db.select(Loan).filter(
+            Loan.borrower_id == sample_id
+        ).order_by(Loan.created_at.desc())),
+        ('property_loans', db.select(Loan).filter(Loan.property_id == sample_id)),
+        ('borrower_properties', db.select(Property).filter(Property.borrower_id == sample_id)),
+        ('borrowers_index', db.select(Borrower).filter(
+            Borrower.is_deleted == False
+        ).order_by(Borrower.created_at.desc()).limit(20)),
+        ('loan_documents_by_type', db.select(Document).filter(
+            Document.loan_id == sample_id,
+            Document.document_type == 'Pagare'
+        )),
+        ('loan_current_documents', db.select(Document).filter(
+            Document.loan_id == sample_id,
+            Document.document_type.in_(['MutuoMercantil', 'Pagare', 'PromesaCompraventa']),
+            Document.is_current == True
+        )),
+        ('document_versions', db.select(Document).filter(Document.parent_id == sample_id)),
+        ('loan_collection_actions', db.select(CollectionAction).filter(
+            CollectionAction.loan_id == sample_id
+        ).order_by(CollectionAction.created_at.desc())),
+    ]
+
+
+def _seq_scans(plan):
+    """Yield relation names of every Seq Scan node in an EXPLAIN JSON plan."""
+    if plan.get('Node Type') == 'Seq Scan':
+        yield plan.get('Relation Name')
+    for child in plan.get('Plans', []):
+        yield from _seq_scans(child)
+
+
+def find_sequential_scans(queries=None):
+    """EXPLAIN each hot query and return {name: [tables seq-scanned]}.
+
+    Sequential scans are disabled for the check, so the planner only falls
+    back to one when no usable index exists. This makes the result
+    independent of how much data the database happens to hold.
+    """
+    engine = db.engine
+    if engine.dialect.name != 'postgresql':
+        raise RuntimeError('Query plan checks require PostgreSQL')
+
+    queries = queries or get_hot_queries()
+    regressions = {}
+    with engine.connect() as conn:
+        with conn.begin():
+            conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            for name, stmt in queries:
+                sql = str(stmt.compile(dialect=engine.dialect,
+                                       compile_kwargs={'literal_binds': True}))
+                result = conn.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {sql}').scalar()
+                if isinstance(result, str):
+                    result = json.loads(result)
+                tables = sorted(set(_seq_scans(result[0]['Plan'])))
+                if tables:
+                    regressions[name] = tables
+    return regressions
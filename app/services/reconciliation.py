@@ -0,0 +1,232 @@
+"""Reconciliation of bank deposits against recorded payments.
+
+Both sides are indexed in dicts so every bank row is matched with a few
+hash lookups instead of a scan over all payments:
+
+1. exact: (amount, date, normalized reference)
+2. reference: (amount, reference token) within DATE_TOLERANCE_DAYS
+3. amount_date: (amount, date) when exactly one payment fits
+
+Results are stored in bank_transactions keyed by a fingerprint of each bank
+row. Matched rows and their payments are left out of later runs, so
+re-running over an overlapping date range only works on what is still open.
+"""
+import csv
+import hashlib
+import re
+from collections import Counter
+from datetime import datetime, timedelta
+from ..models.loan import Loan
+from ..models.payment import Payment
+from ..models.reconciliation import BankTransaction, ReconciliationStatus
+from ..extensions import db
+from .payment_import import read_bank_rows, parse_date, parse_amount
+
+DATE_TOLERANCE_DAYS = 3
+MIN_TOKEN_LENGTH = 4
+
+TOKEN_RE = re.compile(r'[A-Z0-9]+(?:-[A-Z0-9]+)*')
+
+RESULT_COLUMNS = ['result', 'match_method', 'bank_date', 'bank_amount', 'bank_reference',
+                  'payment_id', 'loan_number', 'payment_date', 'payment_amount',
+                  'payment_reference']
+
+
+def normalize_reference(value):
+    return ' '.join(TOKEN_RE.findall((value or '').upper()))
+
+
+def reference_tokens(value):
+    """Fuzzy tokens of a reference: whole tokens plus their digits without leading zeros."""
+    tokens = set()
+    for token in TOKEN_RE.findall((value or '').upper()):
+        if len(token) >= MIN_TOKEN_LENGTH:
+            tokens.add(token)
+        digits = re.sub(r'\D', '', token).lstrip('0')
+        if len(digits) >= MIN_TOKEN_LENGTH:
+            tokens.add(digits)
+    return tokens
+
+
+def fingerprint(transaction_date, amount, reference, occurrence):
+    """Stable key for a bank row; occurrence separates identical rows in one export."""
+    raw = f'{transaction_date.isoformat()}|{amount}|{normalize_reference(reference)}|{occurrence}'
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def load_bank_transactions(stream):
+    """Parse a bank export into dicts; rows that don't parse are returned separately."""
+    transactions = []
+    invalid = []
+    occurrences = Counter()
+    for row_number, fields in read_bank_rows(stream):
+        reference = ' '.join(filter(None, [fields.get('reference'), fields.get('loan_number')]))
+        try:
+            transaction_date = parse_date(fields['date'])
+            amount = parse_amount(fields['amount'])
+        except ValueError as e:
+            invalid.append((row_number, str(e)))
+            continue
+        key = (transaction_date, amount, normalize_reference(reference))
+        occurrences[key] += 1
+        transactions.append({
+            'fingerprint': fingerprint(transaction_date, amount, reference, occurrences[key]),
+            'transaction_date': transaction_date,
+            'amount': amount,
+            'reference': reference[:200],
+        })
+    return transactions, invalid
+
+
+class PaymentIndex:
+    """Hash indexes over candidate payments, with lazy removal of used ones."""
+
+    def __init__(self, payments):
+        self.exact = {}
+        self.by_token = {}
+        self.by_amount_date = {}
+        self.used = set()
+        for payment in payments:
+            self.exact.setdefault(
+                (payment.amount, payment.payment_date, normalize_reference(payment.reference_number)), []
+            ).append(payment)
+            for token in reference_tokens(f'{payment.reference_number or ""} {payment.loan_number}'):
+                self.by_token.setdefault((payment.amount, token), []).append(payment)
+            self.by_amount_date.setdefault((payment.amount, payment.payment_date), []).append(payment)
+
+    def _first_unused(self, candidates, transaction_date=None):
+        best = None
+        for payment in candidates or ():
+            if payment.id in self.used:
+                continue
+            if transaction_date is None:
+                return payment
+            gap = abs((payment.payment_date - transaction_date).days)
+            if gap <= DATE_TOLERANCE_DAYS and (best is None or gap < best[0]):
+                best = (gap, payment)
+        return best[1] if best else None
+
+    def match(self, transaction):
+        amount, transaction_date = transaction['amount'], transaction['transaction_date']
+        payment = self._first_unused(
+            self.exact.get((amount, transaction_date, normalize_reference(transaction['reference'])))
+        )
+        if payment:
+            return payment, 'exact'
+
+        for token in reference_tokens(transaction['reference']):
+            payment = self._first_unused(self.by_token.get((amount, token)), transaction_date)
+            if payment:
+                return payment, 'reference'
+
+        candidates = [p for p in self.by_amount_date.get((amount, transaction_date), ())
+                      if p.id not in self.used]
+        if len(candidates) == 1:
+            return candidates[0], 'amount_date'
+        return None, None
+
+    def claim(self, payment):
+        self.used.add(payment.id)
+
+    def unused(self):
+        seen = set()
+        for payments in self.by_amount_date.values():
+            for payment in payments:
+                if payment.id not in self.used and payment.id not in seen:
+                    seen.add(payment.id)
+                    yield payment
+
+
+def _candidate_payments(start, end):
+    """Payments in the date window that no stored bank transaction has claimed."""
+    claimed = db.select(BankTransaction.id).where(BankTransaction.payment_id == Payment.id).exists()
+    return db.session.execute(
+        db.select(Payment.id, Payment.amount, Payment.payment_date, Payment.reference_number,
+                  Loan.loan_number)
+        .join(Loan, Payment.loan_id == Loan.id)
+        .where(Payment.payment_date.between(start, end), ~claimed)
+    ).all()
+
+
+def _stored_transactions(fingerprints):
+    stored = {}
+    fingerprints = list(fingerprints)
+    for start in range(0, len(fingerprints), 1000):
+        for row in BankTransaction.query.filter(
+            BankTransaction.fingerprint.in_(fingerprints[start:start + 1000])
+        ):
+            stored[row.fingerprint] = row
+    return stored
+
+
+def reconcile(stream, results, source_file=None):
+    """Reconcile a bank export against payments and store the results.
+
+    Writes one result row per bank transaction and per leftover payment to
+    `results` and returns counts: matched (new this run), already_matched,
+    missing, duplicate (payments recorded twice for one deposit), unbanked
+    (payments with no deposit) and invalid.
+    """
+    transactions, invalid = load_bank_transactions(stream)
+    writer = csv.writer(results)
+    writer.writerow(RESULT_COLUMNS)
+    counts = Counter({'matched': 0, 'already_matched': 0, 'missing': 0,
+                      'duplicate': 0, 'unbanked': 0, 'invalid': len(invalid)})
+    if not transactions:
+        return dict(counts)
+
+    dates = [t['transaction_date'] for t in transactions]
+    window = timedelta(days=DATE_TOLERANCE_DAYS)
+    start, end = min(dates) - window, max(dates) + window
+
+    stored = _stored_transactions(t['fingerprint'] for t in transactions)
+    index = PaymentIndex(_candidate_payments(start, end))
+    matched_keys = {}
+    now = datetime.utcnow()
+
+    for transaction in transactions:
+        existing = stored.get(transaction['fingerprint'])
+        if existing is not None and existing.status == ReconciliationStatus.MATCHED.value:
+            counts['already_matched'] += 1
+            matched_keys[(transaction['amount'], transaction['transaction_date'])] = transaction
+            continue
+
+        payment, method = index.match(transaction)
+        if payment:
+            index.claim(payment)
+            status = ReconciliationStatus.MATCHED.value
+            counts['matched'] += 1
+            matched_keys[(transaction['amount'], transaction['transaction_date'])] = transaction
+        else:
+            status = ReconciliationStatus.MISSING.value
+            counts['missing'] += 1
+
+        if existing is None:
+            existing = BankTransaction(source_file=source_file, **transaction)
+            db.session.add(existing)
+        existing.status = status
+        existing.payment_id = payment.id if payment else None
+        existing.match_method = method
+        existing.reconciled_at = now
+
+        writer.writerow([
+            status.lower(), method or '', transaction['transaction_date'], transaction['amount'],
+            transaction['reference'], payment.id if payment else '',
+            payment.loan_number if payment else '', payment.payment_date if payment else '',
+            payment.amount if payment else '', payment.reference_number if payment else ''
+        ])
+
+    # Leftover payments inside the export's own date range
+    for payment in index.unused():
+        if not min(dates) <= payment.payment_date <= max(dates):
+            continue
+        if (payment.amount, payment.payment_date) in matched_keys:
+            result = 'duplicate'  # the deposit it matches is already claimed
+        else:
+            result = 'unbanked'
+        counts[result] += 1
+        writer.writerow([result, '', '', '', '', payment.id, payment.loan_number,
+                         payment.payment_date, payment.amount, payment.reference_number or ''])
+
+    db.session.commit()
+    return dict(counts)
@@ -0,0 +1,232 @@
+"""Nightly Parquet snapshots of the portfolio for offline analysis.
+
+Layout under SNAPSHOT_FOLDER (hive-style partitions):
+
+    payments/created_date=2024-05-01/part-0.parquet      append-only, one per day
+    loans/snapshot_date=2024-05-02/part-0.parquet        full copy per night
+
+Payments never change once recorded, so each run only appends the days
+since the last partition. The other tables are updated in place, so each run
+appends a new dated copy of their current state. Existing partitions are
+never rewritten.
+
+Requires pyarrow (optional dependency).
+"""
+import json
+import os
+import uuid
+from datetime import date, datetime, timedelta
+from flask import current_app
+from sqlalchemy import types
+from sqlalchemy.dialects.postgresql import UUID
+from ..models.borrower import Borrower
+from ..models.loan import Loan
+from ..models.payment import Payment, PaymentSchedule
+from ..models.property import Property
+from ..extensions import db
+from ..utils.db_routing import replica_reads
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Snapshots are optional
+    pa = pq = None
+
+BATCH_ROWS = 50000
+PARTITION_FILE = 'part-0.parquet'
+
+# table name -> (model, partition column, append-only)
+SNAPSHOT_TABLES = {
+    'loans': (Loan, 'snapshot_date', False),
+    'payment_schedule': (PaymentSchedule, 'snapshot_date', False),
+    'payments': (Payment, 'created_date', True),
+    'borrowers': (Borrower, 'snapshot_date', False),
+    'properties': (Property, 'snapshot_date', False),
+}
+
+# Personal data that analysis doesn't need
+EXCLUDED_COLUMNS = {
+    'borrowers': {'dpi', 'nit', 'phone', 'email', 'address', 'verification_notes'},
+    'properties': {'address', 'verification_notes', 'title_pdf_path'},
+}
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def snapshots_available():
+    return pa is not None
+
+
+def snapshot_folder():
+    return current_app.config['SNAPSHOT_FOLDER']
+
+
+def _arrow_type(column_type):
+    if isinstance(column_type, UUID):
+        return pa.string()
+    if isinstance(column_type, types.Boolean):
+        return pa.bool_()
+    if isinstance(column_type, types.Integer):
+        return pa.int64()
+    if isinstance(column_type, types.Numeric) and not isinstance(column_type, types.Float):
+        return pa.decimal128(column_type.precision or 38, column_type.scale or 0)
+    if isinstance(column_type, types.Float):
+        return pa.float64()
+    if isinstance(column_type, types.DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, types.Date):
+        return pa.date32()
+    if isinstance(column_type, types.JSON):
+        return pa.string()
+    if isinstance(column_type, types.String):
+        return pa.string()
+    return None  # e.g. Geography: not exported
+
+
+def _snapshot_columns(table_name, model):
+    """[(column, arrow type)] for the columns that go into the snapshot."""
+    excluded = EXCLUDED_COLUMNS.get(table_name, set())
+    columns = []
+    for column in model.__table__.columns:
+        arrow_type = _arrow_type(column.type)
+        if arrow_type is not None and column.name not in excluded:
+            columns.append((column, arrow_type))
+    return columns
+
+
+def _convert(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _partition_path(table_name, partition_column, value):
+    return os.path.join(snapshot_folder(), table_name, f'{partition_column}={value.isoformat()}')
+
+
+def _existing_partitions(table_name, partition_column):
+    """Dates of completely written partitions.
+
+    A directory without part-0.parquet was left by a failed write and is
+    written again on the next run.
+    """
+    folder = os.path.join(snapshot_folder(), table_name)
+    if not os.path.isdir(folder):
+        return []
+    prefix = f'{partition_column}='
+    return sorted(date.fromisoformat(name[len(prefix):])
+                  for name in os.listdir(folder)
+                  if name.startswith(prefix)
+                  and os.path.exists(os.path.join(folder, name, PARTITION_FILE)))
+
+
+def _write_partition(path, schema, batches):
+    """Write record batches to path/part-0.parquet atomically. Returns row count."""
+    os.makedirs(path, exist_ok=True)
+    final = os.path.join(path, PARTITION_FILE)
+    # Dot-prefixed, so Parquet dataset reads skip a leftover from a failed write
+    tmp = os.path.join(path, f'.{PARTITION_FILE}.tmp')
+    rows = 0
+    with pq.ParquetWriter(tmp, schema, compression='zstd') as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    os.replace(tmp, final)
+    return rows
+
+
+def _record_batches(stmt, columns, schema):
+    """Stream a select from a server-side cursor as Arrow record batches."""
+    result = db.session.execute(stmt.execution_options(yield_per=BATCH_ROWS))
+    for rows in result.partitions():
+        arrays = [
+            pa.array([_convert(row[i]) for row in rows], type=arrow_type)
+            for i, (_, arrow_type) in enumerate(columns)
+        ]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def snapshot_table(table_name, today=None):
+    """Append the missing partitions for one table. Returns {partition date: rows}."""
+    if pa is None:
+        raise SnapshotError('Snapshots require pyarrow (pip install pyarrow)')
+    model, partition_column, append_only = SNAPSHOT_TABLES[table_name]
+    today = today or date.today()
+    columns = _snapshot_columns(table_name, model)
+    schema = pa.schema([pa.field(column.name, arrow_type) for column, arrow_type in columns])
+    select = db.select(*[column for column, _ in columns])
+    existing = _existing_partitions(table_name, partition_column)
+    written = {}
+
+    if not append_only:
+        if today not in existing:
+            path = _partition_path(table_name, partition_column, today)
+            written[today] = _write_partition(path, schema, _record_batches(
+                select.order_by(model.__table__.primary_key.columns.values()[0]), columns, schema
+            ))
+        return written
+
+    # Append-only: one partition per complete day since the last one written
+    created_at = model.__table__.c.created_at
+    if existing:
+        start = existing[-1] + timedelta(days=1)
+    else:
+        first = db.session.execute(db.select(db.func.min(created_at))).scalar()
+        if first is None:
+            return written
+        start = first.date()
+
+    day = start
+    while day < today:
+        path = _partition_path(table_name, partition_column, day)
+        day_start = datetime.combine(day, datetime.min.time())
+        written[day] = _write_partition(path, schema, _record_batches(
+            select.where(created_at >= day_start, created_at < day_start + timedelta(days=1))
+            .order_by(created_at),
+            columns, schema
+        ))
+        day += timedelta(days=1)
+    return written
+
+
+def snapshot_portfolio(tables=None, today=None):
+    """Snapshot every table (or the given ones), reading from the replica if configured."""
+    results = {}
+    with replica_reads():
+        for table_name in tables or SNAPSHOT_TABLES:
+            results[table_name] = snapshot_table(table_name, today)
+    db.session.remove()
+    return results
+
+
+def load_snapshot(table_name, snapshot_date=None, folder=None, as_pandas=True, **read_options):
+    """Load a snapshot table, memory-mapped, as a pandas DataFrame or Arrow table.
+
+    Snapshot tables default to their latest night; pass snapshot_date to read
+    an older one. Payments load every partition unless `filters` are given.
+    Usable without an app context by passing `folder`.
+    """
+    if pa is None:
+        raise SnapshotError('Snapshots require pyarrow (pip install pyarrow)')
+    folder = folder or snapshot_folder()
+    _, partition_column, append_only = SNAPSHOT_TABLES[table_name]
+    path = os.path.join(folder, table_name)
+    if not os.path.isdir(path):
+        raise SnapshotError(f'No snapshot of {table_name} in {folder}')
+
+    if not append_only:
+        if snapshot_date is None:
+            dates = sorted(name.split('=', 1)[1] for name in os.listdir(path)
+                           if name.startswith(f'{partition_column}=')
+                           and os.path.exists(os.path.join(path, name, PARTITION_FILE)))
+            if not dates:
+                raise SnapshotError(f'No snapshot of {table_name} in {folder}')
+            snapshot_date = dates[-1]
+        path = os.path.join(path, f'{partition_column}={snapshot_date}')
+
+    table = pq.read_table(path, memory_map=True, **read_options)
+    return table.to_pandas() if as_pandas else table
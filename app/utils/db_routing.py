@@ -0,0 +1,120 @@
+"""Primary/replica routing for the SQLAlchemy session.
+
+Reads issued inside a ``replica_reads()`` block (or a route decorated with
+``read_only``) go to the ``replica`` bind when one is configured. Everything
+else, including any statement issued after the session has flushed, stays
+on the primary.
+"""
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+
+REPLICA_BIND_KEY = 'replica'
+
+# Flask session key holding the timestamp until which reads stay on the primary
+STICKY_PRIMARY_KEY = '_db_primary_until'
+
+# How often (seconds) each worker re-checks replication lag
+LAG_CHECK_INTERVAL = 10
+
+_lag_state = {'checked_at': 0.0, 'fresh': True}
+
+
+class RoutingSession(Session):
+    """Session that sends read-only work to the replica bind."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_replica(clause):
+            engine = self._db.engines.get(REPLICA_BIND_KEY)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _use_replica(self, clause):
+        if not has_app_context() or not g.get('_db_use_replica'):
+            return False
+        if self._flushing or self.info.get('has_writes'):
+            return False
+        if getattr(clause, 'is_dml', False):
+            return False
+        return replica_is_fresh()
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_writes(db_session, flush_context):
+    db_session.info['has_writes'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _stick_to_primary(db_session):
+    """Keep this user's reads on the primary until the replica catches up."""
+    if db_session.info.pop('has_writes', False) and has_request_context():
+        tolerance = current_app.config.get('REPLICA_LAG_TOLERANCE', 5)
+        session[STICKY_PRIMARY_KEY] = time.time() + tolerance
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _clear_writes(db_session):
+    db_session.info.pop('has_writes', None)
+
+
+def replica_configured():
+    return REPLICA_BIND_KEY in (current_app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+def replica_is_fresh():
+    """Return False when the replica lags more than REPLICA_LAG_TOLERANCE."""
+    now = time.monotonic()
+    if now - _lag_state['checked_at'] < LAG_CHECK_INTERVAL:
+        return _lag_state['fresh']
+
+    from ..extensions import db
+    engine = db.engines.get(REPLICA_BIND_KEY)
+    fresh = True
+    if engine is not None and engine.dialect.name == 'postgresql':
+        try:
+            with engine.connect() as conn:
+                lag = conn.execute(text(
+                    'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+                    'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+                )).scalar()
+            fresh = (lag or 0) <= current_app.config.get('REPLICA_LAG_TOLERANCE', 5)
+        except SQLAlchemyError as e:
+            current_app.logger.warning(f'Replica lag check failed: {str(e)}')
+            fresh = False
+
+    _lag_state['checked_at'] = now
+    _lag_state['fresh'] = fresh
+    return fresh
+
+
+def recently_wrote():
+    """True when the current user committed a write within the lag tolerance."""
+    if not has_request_context():
+        return False
+    return session.get(STICKY_PRIMARY_KEY, 0) > time.time()
+
+
+@contextmanager
+def replica_reads():
+    """Route reads in this block to the replica (no-op without one)."""
+    previous = g.get('_db_use_replica', False)
+    g._db_use_replica = replica_configured() and not recently_wrote()
+    try:
+        yield
+    finally:
+        g._db_use_replica = previous
+
+
+@contextmanager
+def primary_reads():
+    """Force reads in this block onto the primary, e.g. right after a write."""
+    previous = g.get('_db_use_replica', False)
+    g._db_use_replica = False
+    try:
+        yield
+    finally:
+        g._db_use_replica = previous
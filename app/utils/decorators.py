@@ -1,6 +1,7 @@
 from functools import wraps
 from flask import flash, redirect, url_for, abort
 from flask_login import current_user
+from .db_routing import replica_reads
 
 
 def role_required(*role_names):
@@ -82,3 +83,12 @@ def internal_only(f):
 
         return f(*args, **kwargs)
     return decorated_function
+
+
+def read_only(f):
+    """Decorator to serve a route's reads from the replica, if configured."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        with replica_reads():
+            return f(*args, **kwargs)
+    return decorated_function
@@ -0,0 +1,59 @@
+"""Serving uploaded files after the view has checked access.
+
+DOWNLOAD_OFFLOAD picks who sends the bytes:
+
+- ``send_file``: Flask streams the file itself, with Range, ETag and
+  If-None-Match handled by Werkzeug. Fine for development.
+- ``x-sendfile``: the response carries only an X-Sendfile header and Apache
+  (mod_xsendfile, see apache-ancla.conf) sends the file, so a slow client
+  doesn't hold a gunicorn worker for the whole transfer.
+- ``x-accel-redirect``: the same for nginx, via an internal location that
+  maps X_ACCEL_PREFIX onto UPLOAD_FOLDER.
+"""
+import mimetypes
+import os
+import unicodedata
+from urllib.parse import quote
+from flask import Response, current_app, send_file
+from .helpers import get_file_path
+
+# A content-addressed path already names its content, so its digest is a strong ETag
+_BLOB_NAME_LENGTH = 64
+
+
+def _etag(relative_path):
+    digest = os.path.splitext(os.path.basename(relative_path))[0]
+    if len(digest) == _BLOB_NAME_LENGTH and all(c in '0123456789abcdef' for c in digest):
+        return digest
+    return True  # let Werkzeug derive one from mtime and size
+
+
+def _content_disposition(response, download_name, as_attachment):
+    disposition = 'attachment' if as_attachment else 'inline'
+    try:
+        download_name.encode('ascii')
+        response.headers.set('Content-Disposition', disposition, filename=download_name)
+    except UnicodeEncodeError:
+        ascii_name = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode()
+        response.headers.set('Content-Disposition', disposition, filename=ascii_name,
+                             **{'filename*': f"UTF-8''{quote(download_name, safe='')}"})
+
+
+def send_upload(relative_path, download_name=None, as_attachment=False):
+    """Response serving a file under UPLOAD_FOLDER, or None if it doesn't exist."""
+    full_path = get_file_path(relative_path)
+    if not full_path or not os.path.isfile(full_path):
+        return None
+    download_name = download_name or os.path.basename(relative_path)
+
+    if current_app.config.get('DOWNLOAD_OFFLOAD') == 'x-accel-redirect':
+        mimetype = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+        response = Response(mimetype=mimetype)
+        prefix = current_app.config['X_ACCEL_PREFIX'].rstrip('/')
+        response.headers['X-Accel-Redirect'] = quote(f'{prefix}/{relative_path}')
+        _content_disposition(response, download_name, as_attachment)
+        return response
+
+    # USE_X_SENDFILE makes send_file answer with an X-Sendfile header instead of the body
+    return send_file(full_path, as_attachment=as_attachment, download_name=download_name,
+                     etag=_etag(relative_path), conditional=True)
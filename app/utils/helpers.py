@@ -1,13 +1,15 @@
 import os
-import uuid
 from datetime import datetime
-from werkzeug.utils import secure_filename
 from flask import current_app
 
 
 ALLOWED_DOCUMENT_EXTENSIONS = {'pdf', 'doc', 'docx'}
 ALLOWED_IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
+# Content types accepted after sniffing the uploaded bytes
+PDF_MIME_TYPES = {'application/pdf'}
+IMAGE_MIME_TYPES = {'image/png', 'image/jpeg', 'image/gif'}
+
 
 def allowed_document(filename):
     """Check if file is an allowed document type."""
@@ -21,36 +23,24 @@ def allowed_image(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_IMAGE_EXTENSIONS
 
 
-def save_uploaded_file(file, subfolder='documents'):
-    """Save an uploaded file and return the path."""
+def save_uploaded_file(file, subfolder='documents', allowed_types=None):
+    """Save an uploaded file in the content-addressed store and return the path.
+
+    Identical content is stored once; see services/file_store.py. Use
+    store_upload() directly when the size, hash or MIME type are needed.
+    """
     if not file:
         return None
-
-    filename = secure_filename(file.filename)
-    # Add unique prefix to avoid collisions
-    unique_filename = f'{uuid.uuid4().hex}_{filename}'
-
-    upload_folder = os.path.join(
-        current_app.config['UPLOAD_FOLDER'],
-        subfolder
-    )
-    os.makedirs(upload_folder, exist_ok=True)
-
-    file_path = os.path.join(upload_folder, unique_filename)
-    file.save(file_path)
-
-    # Return relative path from upload folder
-    return os.path.join(subfolder, unique_filename)
+    from ..services.file_store import store_upload
+    return store_upload(file, subfolder, allowed_types).path
 
 
 def delete_uploaded_file(file_path):
-    """Delete an uploaded file."""
+    """Delete an uploaded file unless another record still refers to it."""
     if not file_path:
         return
-
-    full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], file_path)
-    if os.path.exists(full_path):
-        os.remove(full_path)
+    from ..services.file_store import release_file
+    release_file(file_path)
 
 
 def get_file_path(relative_path):
@@ -0,0 +1,57 @@
+"""Time-ordered UUIDv7 generation (RFC 9562).
+
+UUIDv7 keeps the 48-bit Unix millisecond timestamp in the high bits, so new
+primary keys land at the right-hand edge of the B-tree instead of at random
+pages like uuid4.
+"""
+import os
+import threading
+import time
+import uuid
+from datetime import timezone
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+_COUNTER_BITS = 12
+_COUNTER_MAX = (1 << _COUNTER_BITS) - 1
+
+
+def _build(unix_ms, rand_a, rand_b):
+    value = (unix_ms & ((1 << 48) - 1)) << 80
+    value |= 0x7 << 76
+    value |= (rand_a & _COUNTER_MAX) << 64
+    value |= 0b10 << 62
+    value |= rand_b & ((1 << 62) - 1)
+    return uuid.UUID(int=value)
+
+
+def uuid7():
+    """Return a new UUIDv7, monotonic within this process."""
+    global _last_ms, _counter
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            # Random start leaves room to count up within the millisecond
+            _counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        else:
+            _counter += 1
+            if _counter > _COUNTER_MAX:
+                _last_ms += 1
+                _counter = 0
+        unix_ms, counter = _last_ms, _counter
+    return _build(unix_ms, counter, int.from_bytes(os.urandom(8), 'big'))
+
+
+def uuid7_from_datetime(dt):
+    """UUIDv7 for a past timestamp, used when re-keying existing rows.
+
+    Naive datetimes are taken as UTC, matching the datetime.utcnow defaults.
+    """
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    unix_ms = int(dt.timestamp() * 1000)
+    return _build(unix_ms, int.from_bytes(os.urandom(2), 'big'),
+                  int.from_bytes(os.urandom(8), 'big'))
@@ -0,0 +1,174 @@
+"""Cached principal for the logged-in user.
+
+Flask-Login's user loader returns a Principal rather than a User: the
+user's id, name, flags and role name, with the role's JSON permissions
+compiled once into a frozenset. role_required, internal_only,
+permission_required and templates read only those, so checking access
+costs no query.
+
+Principals are cached per worker for PRINCIPAL_CACHE_SECONDS. An expired
+entry is revalidated against users.auth_version (a primary-key lookup of
+one column) and only reloaded when the stamp changed.
+change_user_role and toggle_user_active bump the stamp through
+invalidate_principal(). The worker that made the change drops its entry
+at once, and the other workers notice within the TTL. Deactivated
+users are logged out when their principal is reloaded.
+
+Anything else a route asks of current_user (borrower_profile, set_password,
+...) loads the User row on first use in that request.
+"""
+import threading
+import time
+import uuid
+from collections import namedtuple
+from flask import current_app
+from ..extensions import db
+
+# Prune expired entries once the cache holds this many users
+MAX_ENTRIES = 5000
+
+PrincipalRole = namedtuple('PrincipalRole', 'name permissions')
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def compile_permissions(permissions):
+    """frozenset of (resource, action) pairs; ('all', True) grants everything."""
+    permissions = permissions or {}
+    compiled = {('all', True)} if permissions.get('all') is True else set()
+    for resource, actions in permissions.items():
+        if isinstance(actions, (list, tuple)):
+            compiled.update((resource, action) for action in actions)
+    return frozenset(compiled)
+
+
+class PrincipalData(namedtuple('PrincipalData', 'id email full_name role_name permissions '
+                                                'is_active is_verified auth_version')):
+    """Immutable snapshot shared by every request of a user in this worker."""
+
+    @classmethod
+    def from_user(cls, user):
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            role_name=user.role.name,
+            permissions=compile_permissions(user.role.permissions),
+            is_active=bool(user.is_active),
+            is_verified=bool(user.is_verified),
+            auth_version=user.auth_version,
+        )
+
+
+class Principal:
+    """current_user for one request, built on a cached PrincipalData."""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, data):
+        self.id = data.id
+        self.email = data.email
+        self.full_name = data.full_name
+        self.is_active = data.is_active
+        self.is_verified = data.is_verified
+        self.role = PrincipalRole(data.role_name, data.permissions)
+        self._user = None
+        self._borrower_profile = None
+
+    def __repr__(self):
+        return f'<Principal {self.email} ({self.role.name})>'
+
+    def get_id(self):
+        return str(self.id)
+
+    def has_role(self, *role_names):
+        return self.role.name in role_names
+
+    def is_admin(self):
+        from ..models.user import RoleName
+        return self.role.name == RoleName.ADMIN.value
+
+    def can(self, resource, action):
+        return ('all', True) in self.role.permissions or (resource, action) in self.role.permissions
+
+    @property
+    def user(self):
+        """The User row, loaded on first use in this request."""
+        if self._user is None:
+            from ..models.user import User
+            self._user = db.session.get(User, self.id)
+        return self._user
+
+    @property
+    def borrower_profile(self):
+        if self._borrower_profile is None:
+            from ..models.borrower import Borrower
+            self._borrower_profile = Borrower.query.filter_by(user_id=self.id).first()
+        return self._borrower_profile
+
+    def __getattr__(self, name):
+        # Only reached for attributes a Principal doesn't carry
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+
+def _ttl():
+    return current_app.config.get('PRINCIPAL_CACHE_SECONDS', 60)
+
+
+def _store(key, data):
+    now = time.monotonic()
+    with _lock:
+        if len(_cache) >= MAX_ENTRIES:
+            for stale in [k for k, (_, expires) in _cache.items() if expires <= now]:
+                del _cache[stale]
+        _cache[key] = (data, now + _ttl())
+
+
+def _load(user_id):
+    from ..models.statements import user_with_role
+    user = db.session.execute(user_with_role(user_id)).scalar_one_or_none()
+    return PrincipalData.from_user(user) if user else None
+
+
+def _auth_version(user_id):
+    from ..models.user import User
+    return db.session.execute(
+        db.select(User.auth_version).where(User.id == user_id)
+    ).scalar_one_or_none()
+
+
+def load_principal(user_id):
+    """Principal for a session's user id, or None if the user is gone or inactive."""
+    try:
+        user_id = uuid.UUID(str(user_id))
+    except ValueError:
+        return None
+    key = str(user_id)
+    entry = _cache.get(key)
+    if entry and entry[1] > time.monotonic():
+        data = entry[0]
+    else:
+        if entry and _auth_version(user_id) == entry[0].auth_version:
+            data = entry[0]
+        else:
+            data = _load(user_id)
+        if data is None:
+            with _lock:
+                _cache.pop(key, None)
+            return None
+        _store(key, data)
+    return Principal(data) if data.is_active else None
+
+
+def invalidate_principal(user):
+    """Bump a user's auth version after changing their role or status.
+
+    The caller commits. Other workers pick the change up within the TTL.
+    """
+    user.auth_version = (user.auth_version or 0) + 1
+    with _lock:
+        _cache.pop(str(user.id), None)
@@ -0,0 +1,141 @@
+"""Per-request SQL query counting and N+1 detection."""
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+_listeners_installed = False
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_IN_LIST_RE = re.compile(r'IN \((?:[^()]*)\)', re.IGNORECASE)
+_NUMBER_RE = re.compile(r'\b\d+\b')
+
+
+def statement_shape(statement):
+    """Normalize a statement so repeated queries differing only in values match."""
+    shape = _WHITESPACE_RE.sub(' ', statement).strip()
+    shape = _IN_LIST_RE.sub('IN (...)', shape)
+    return _NUMBER_RE.sub('?', shape)
+
+
+class QueryStats:
+    """Query count, total DB time and statement shapes for one unit of work."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        """Return (shape, count) pairs run at least `threshold` times."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+
+def _collectors():
+    if not hasattr(_local, 'collectors'):
+        _local.collectors = []
+    return _local.collectors
+
+
+# The start time lives on the execution context, which is discarded with the
+# statement even if it raises, so nothing accumulates on pooled connections.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_query_start_time', None)
+    collectors = _collectors()
+    if collectors and started is not None:
+        duration = time.perf_counter() - started
+        for stats in collectors:
+            stats.record(statement, duration)
+
+
+def install_listeners():
+    global _listeners_installed
+    if not _listeners_installed:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _listeners_installed = True
+
+
+@contextmanager
+def count_queries():
+    """Collect QueryStats for every statement executed inside the block."""
+    install_listeners()
+    stats = QueryStats()
+    _collectors().append(stats)
+    try:
+        yield stats
+    finally:
+        _collectors().remove(stats)
+
+
+@contextmanager
+def assert_max_queries(limit):
+    """Fail if the block runs more than `limit` queries.
+
+    Usage in tests:
+        with assert_max_queries(8):
+            client.get(f'/loans/{loan.id}')
+    """
+    with count_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        details = '\n'.join(f'  {n}x {shape}' for shape, n in stats.shapes.most_common(10))
+        raise AssertionError(f'Expected at most {limit} queries, ran {stats.count}:\n{details}')
+
+
+def init_query_stats(app):
+    """Count queries per request, warn on likely N+1 and add Server-Timing."""
+    if not app.config.get('SQL_QUERY_STATS'):
+        return
+    install_listeners()
+
+    @app.before_request
+    def start_query_stats():
+        stats = QueryStats()
+        _collectors().append(stats)
+        request.environ['ancla.query_stats'] = stats
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = request.environ.pop('ancla.query_stats', None)
+        if stats is None:
+            return response
+        if stats in _collectors():
+            _collectors().remove(stats)
+
+        threshold = current_app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 5)
+        for shape, n in stats.repeated(threshold):
+            current_app.logger.warning(
+                f'Possible N+1 on {request.endpoint}: {n}x {shape[:200]}'
+            )
+
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={stats.duration_ms:.1f};desc="{stats.count} queries"'
+        )
+        return response
+
+    @app.teardown_request
+    def discard_query_stats(exc):
+        stats = request.environ.pop('ancla.query_stats', None)
+        if stats is not None and stats in _collectors():
+            _collectors().remove(stats)
@@ -0,0 +1,149 @@
+"""Slow-query log written as rotating JSON lines, plus report aggregation."""
+import glob
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from .query_stats import statement_shape
+
+slow_log = logging.getLogger('ancla.slow_sql')
+
+_APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_THIS_FILE = os.path.abspath(__file__)
+_settings = {}
+
+
+def param_shape(parameters):
+    """Describe bind parameters by type only, never by value."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return {'rows': len(parameters), 'row': param_shape(parameters[0])}
+        return [type(value).__name__ for value in parameters]
+    return None
+
+
+def _current_endpoint():
+    if has_request_context():
+        return request.endpoint or request.path
+    import click
+    ctx = click.get_current_context(silent=True)
+    if ctx is not None:
+        return f'cli:{ctx.info_name}'
+    return None
+
+
+def _originating_function():
+    """Return the innermost application frame (view, service or template)."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename != _THIS_FILE and (filename.startswith(_APP_DIR) or filename.endswith('.html')):
+            rel = os.path.relpath(filename, _APP_DIR) if filename.startswith(_APP_DIR) else filename
+            return f'{rel}:{frame.f_code.co_name}:{frame.f_lineno}'
+        frame = frame.f_back
+    return None
+
+
+# Kept on the execution context, not conn.info, so a failed statement leaves nothing behind
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._profiler_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_profiler_start_time', None)
+    if started is None:
+        return
+    duration_ms = (time.perf_counter() - started) * 1000
+    if duration_ms < _settings['threshold_ms']:
+        return
+
+    record = {
+        'ts': datetime.utcnow().isoformat(),
+        'duration_ms': round(duration_ms, 2),
+        'endpoint': _current_endpoint(),
+        'statement': statement,
+        'params': param_shape(parameters),
+        'executemany': executemany,
+    }
+    if random.random() < _settings['sample_rate']:
+        record['origin'] = _originating_function()
+    slow_log.info(json.dumps(record, default=str))
+
+
+def init_sql_profiler(app):
+    """Write queries slower than SLOW_QUERY_THRESHOLD_MS to SLOW_QUERY_LOG."""
+    log_path = app.config.get('SLOW_QUERY_LOG')
+    if not log_path:
+        return
+
+    _settings['threshold_ms'] = app.config.get('SLOW_QUERY_THRESHOLD_MS', 200)
+    _settings['sample_rate'] = app.config.get('SQL_PROFILE_SAMPLE_RATE', 0.1)
+
+    if not slow_log.handlers:
+        os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+        handler = RotatingFileHandler(
+            log_path,
+            maxBytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+            backupCount=app.config.get('SLOW_QUERY_LOG_BACKUPS', 5)
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        slow_log.addHandler(handler)
+        slow_log.setLevel(logging.INFO)
+        slow_log.propagate = False
+
+    if not event.contains(Engine, 'after_cursor_execute', _after_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def read_slow_log(log_path):
+    """Yield records from the slow log and its rotated backups."""
+    for path in sorted(glob.glob(f'{log_path}*')):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def aggregate_slow_log(records, top=10):
+    """Group records by endpoint and statement shape, slowest total first.
+
+    Returns a list of (endpoint, endpoint_total_ms, [statement rows]) where
+    each statement row has shape, count, total_ms, max_ms and origins.
+    """
+    endpoints = defaultdict(lambda: defaultdict(lambda: {
+        'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'origins': set()
+    }))
+    for record in records:
+        entry = endpoints[record.get('endpoint') or '-'][statement_shape(record['statement'])]
+        entry['count'] += 1
+        entry['total_ms'] += record['duration_ms']
+        entry['max_ms'] = max(entry['max_ms'], record['duration_ms'])
+        if record.get('origin'):
+            entry['origins'].add(record['origin'])
+
+    report = []
+    for endpoint, shapes in endpoints.items():
+        rows = sorted(
+            ({'shape': shape, **stats} for shape, stats in shapes.items()),
+            key=lambda row: row['total_ms'], reverse=True
+        )
+        report.append((endpoint, sum(row['total_ms'] for row in rows), rows[:top]))
+    report.sort(key=lambda item: item[1], reverse=True)
+    return report